@@ -1,5 +1,6 @@
 import urllib
 
+from django.db import transaction
 from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 
@@ -11,6 +12,9 @@ from orders.models import Order, OrderProduct
 from django.contrib import messages, auth
 from django.contrib.auth.decorators import login_required
 from coupons.models import Coupon, CouponUsage
+from coupons.wallet import get_coupon_wallet
+from management.rollups import update_order_status
+from coupons.redemption import update_order_coupon
 
 
 #VERIFICATION EMAIL
@@ -21,8 +25,10 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import EmailMessage
 
-from carts.views import _cart_id
 from carts.models import Cart, CartItem
+from carts.utils import sync_cart_count
+from carts.operations import merge_session_cart
+from carts.views import _session_cart
 import requests
 from datetime import timedelta
 from django.utils import timezone
@@ -82,46 +88,12 @@ def login(request):
         user =  auth.authenticate(email=email, password=password)
 
         if user is not None:
-            try:
-                cart = Cart.objects.get(cart_id=_cart_id(request))
-                is_cart_item_exists = CartItem.objects.filter(cart = cart).exists()
-                if is_cart_item_exists:
-                    cart_item = CartItem.objects.filter(cart=cart)
-
-                    #Getting product variation by cart_id
-                    product_variation = []
-                    for item in cart_item:
-                        variation = item.variations.all()
-                        product_variation.append(list(variation))
-
-                    # Getting the cart items from the user to access his product variations
-                    cart_item = CartItem.objects.filter(user=user)
-                    ex_var_list = []
-                    id = []
-                    for item in cart_item:
-                        existing_variation = item.variations.all()
-                        ex_var_list.append(list(existing_variation))
-                        id.append(item.id)
-
-                    #product_variation = [1, 2, 3, 4, 6]
-                    #ex_var_list = [4, 6, 3, 5]
-
-                    for pr in product_variation:
-                        if pr in ex_var_list:
-                            index = ex_var_list.index(pr)
-                            item_id = id[index]
-                            item = CartItem.objects.get(id=item_id)
-                            item.quantity += 1
-                            item.user = user
-                            item.save()
-                        else:
-                            cart_item = CartItem.objects.filter(cart=cart)
-                            for item in cart_item:
-                                item.user = user
-                                item.save()
-            except:
-                pass
+            # Gộp giỏ hàng của khách vào giỏ hàng của user (trước khi login đổi session key)
+            cart = _session_cart(request)
+            if cart is not None:
+                merge_session_cart(cart, user)
             auth.login(request, user)
+            sync_cart_count(request)
             messages.success(request, 'You are logged in')
             url = request.META.get('HTTP_REFERER')
             try:
@@ -402,8 +374,13 @@ def order_detail(request, order_number):
 
 
            if new_status in valid_statuses:
+               old_status = order.status
                order.status = new_status
-               order.save()
+               # Trạng thái, bảng tổng hợp doanh số và lượt coupon đổi cùng nhau hoặc không đổi gì
+               with transaction.atomic():
+                   order.save()
+                   update_order_status(order, old_status)
+                   update_order_coupon(order, old_status)
                messages.success(request, f'Order status updated to {new_status}')
                return redirect('order_detail', order_number=order_number)
            else:
@@ -599,48 +576,9 @@ def delete_customer(request, customer_id):
 
 @login_required(login_url='login')
 def my_coupons_view(request):
-   user = request.user
-
-
-   # Lấy tất cả coupon, để model tự quyết định trạng thái (active / upcoming / expired / inactive)
-   all_coupons = Coupon.objects.all().order_by('-valid_to')
-
-
-   visible_coupons = []
-
-
-   for coupon in all_coupons:
-       status = coupon.get_status()  # 'active', 'upcoming', 'expired', 'inactive'
-
-
-       # ❌ Bỏ qua những mã đã hết hạn hoặc đang tắt
-       if status in ("expired", "inactive"):
-           continue
-
-
-       # ✅ Giữ lại cả "active" và "upcoming"
-       # Kiểm tra giới hạn tổng số lần sử dụng (toàn hệ thống)
-       if coupon.max_usage_count > 0:
-           total_used = CouponUsage.objects.filter(coupon=coupon).count()
-           if total_used >= coupon.max_usage_count:
-               continue  # đã dùng hết lượt phát hành
-
-
-       # Kiểm tra giới hạn theo từng khách hàng
-       if coupon.max_usage_per_customer > 0:
-           user_used = CouponUsage.objects.filter(
-               coupon=coupon,
-               user=user,
-           ).count()
-           if user_used >= coupon.max_usage_per_customer:
-               continue  # user này đã dùng hết lượt cho mã này
-
-       visible_coupons.append(coupon)
-
-   visible_coupons.sort(key=lambda c: c.valid_to)
-
+   # Mã còn hạn / sắp bắt đầu và user còn lượt dùng – 1 query, có cache theo user (coupons/wallet.py)
    context = {
-       "coupons": visible_coupons,
+       "coupons": get_coupon_wallet(request.user),
    }
    return render(request, "accounts/my_coupons.html", context)
 
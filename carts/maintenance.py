@@ -0,0 +1,54 @@
+import datetime
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Cart
+
+
+# Giỏ hàng của khách (theo session) không bao giờ tự bị xoá → dọn định kỳ:
+#   python manage.py reap_carts            (chạy bằng cron / scheduler, ví dụ mỗi đêm)
+# Giỏ hàng bị coi là bỏ quên khi tạo trước CART_EXPIRE_DAYS ngày và session của nó đã hết hạn / không còn.
+CART_EXPIRE_DAYS = getattr(settings, 'CART_EXPIRE_DAYS', 30)
+CART_REAP_BATCH_SIZE = 500
+
+DB_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def get_expired_carts(days=CART_EXPIRE_DAYS):
+    cutoff = timezone.localdate() - datetime.timedelta(days=days)
+    carts = Cart.objects.filter(date_added__lt=cutoff)
+
+    # Session lưu trong DB → giữ lại giỏ hàng có session còn sống (khách vẫn đang quay lại)
+    if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+        live_session = Session.objects.filter(session_key=OuterRef('cart_id'), expire_date__gt=timezone.now())
+        carts = carts.filter(~Exists(live_session))
+    return carts
+
+
+def reap_expired_carts(days=CART_EXPIRE_DAYS, batch_size=CART_REAP_BATCH_SIZE):
+    """
+    Xoá giỏ hàng bỏ quên theo từng batch (CartItem bị xoá theo CASCADE),
+    mỗi batch là 1 transaction ngắn để không khoá bảng lâu.
+    Trả về (số Cart, số CartItem) đã xoá.
+    """
+    carts_deleted = 0
+    items_deleted = 0
+    expired = get_expired_carts(days)
+
+    while True:
+        batch = list(expired.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not batch:
+            break
+        _, per_model = Cart.objects.filter(id__in=batch).delete()
+        carts_deleted += per_model.get(Cart._meta.label, 0)
+        items_deleted += per_model.get('carts.CartItem', 0)
+        if len(batch) < batch_size:
+            break
+
+    return carts_deleted, items_deleted
@@ -0,0 +1,33 @@
+from django.contrib.sessions.models import Session
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from carts.maintenance import (
+    CART_EXPIRE_DAYS, CART_REAP_BATCH_SIZE, DB_SESSION_ENGINES, get_expired_carts, reap_expired_carts,
+)
+
+
+class Command(BaseCommand):
+    help = "Xoá giỏ hàng của khách đã bỏ quên (kèm CartItem) theo từng batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=CART_EXPIRE_DAYS,
+                            help=f"Xoá giỏ hàng tạo trước N ngày (mặc định {CART_EXPIRE_DAYS}).")
+        parser.add_argument('--batch-size', type=int, default=CART_REAP_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ đếm, không xoá.")
+        parser.add_argument('--clear-sessions', action='store_true',
+                            help="Xoá luôn các session đã hết hạn (bảng django_session).")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = get_expired_carts(options['days']).count()
+            self.stdout.write(self.style.WARNING(f"{count} giỏ hàng sẽ bị xoá (dry run)."))
+            return
+
+        carts, items = reap_expired_carts(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Đã xoá {carts} giỏ hàng, {items} sản phẩm trong giỏ."))
+
+        if options['clear_sessions'] and settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+            sessions, _ = Session.objects.filter(expire_date__lt=timezone.now()).delete()
+            self.stdout.write(self.style.SUCCESS(f"Đã xoá {sessions} session hết hạn."))
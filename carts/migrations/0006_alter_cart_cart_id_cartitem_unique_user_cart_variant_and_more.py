@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """Gộp dữ liệu trùng trước khi thêm ràng buộc unique."""
+    Cart = apps.get_model('carts', 'Cart')
+    CartItem = apps.get_model('carts', 'CartItem')
+
+    # Nhiều Cart cùng cart_id → dồn CartItem về Cart có id nhỏ nhất
+    keep = {}
+    for cart in Cart.objects.order_by('id'):
+        if cart.cart_id in keep:
+            CartItem.objects.filter(cart_id=cart.id).update(cart_id=keep[cart.cart_id])
+            cart.delete()
+        else:
+            keep[cart.cart_id] = cart.id
+
+    # Nhiều dòng cùng biến thể trong 1 giỏ → cộng số lượng vào dòng đầu tiên
+    for owner_field in ('user_id', 'cart_id'):
+        first = {}
+        items = CartItem.objects.filter(**{owner_field + '__isnull': False}).order_by('id')
+        for item in items:
+            key = (getattr(item, owner_field), item.variant_id)
+            if item.variant_id is None:
+                continue
+            if key in first:
+                CartItem.objects.filter(pk=first[key]).update(quantity=models.F('quantity') + item.quantity)
+                item.delete()
+            else:
+                first[key] = item.pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0005_remove_cartitem_variations_cartitem_variant_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cart',
+            name='cart_id',
+            field=models.CharField(blank=True, max_length=250, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'variant'), name='unique_user_cart_variant'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('cart__isnull', False)), fields=('cart', 'variant'), name='unique_session_cart_variant'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0006_alter_cart_cart_id_cartitem_unique_user_cart_variant_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['date_added', 'cart_id'], name='carts_cart_date_ad_1a2f5d_idx'),
+        ),
+    ]
@@ -4,9 +4,15 @@ from store.models import Product, ProductVariant
 
 
 class Cart(models.Model):
-    cart_id = models.CharField(max_length=250, blank=True)
+    cart_id = models.CharField(max_length=250, blank=True, unique=True)
     date_added = models.DateField(auto_now_add=True)
 
+    class Meta:
+        # reap_carts quét giỏ hàng cũ theo ngày tạo (cart_id đã có index unique)
+        indexes = [
+            models.Index(fields=['date_added', 'cart_id']),
+        ]
+
     def __str__(self):
         return self.cart_id
 
@@ -20,6 +26,15 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # Mỗi biến thể chỉ có 1 dòng trong 1 giỏ hàng → thêm vào giỏ là UPDATE, tạo trùng sẽ báo IntegrityError
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'variant'], condition=models.Q(user__isnull=False), name='unique_user_cart_variant'),
+            models.UniqueConstraint(
+                fields=['cart', 'variant'], condition=models.Q(cart__isnull=False), name='unique_session_cart_variant'),
+        ]
+
     def sub_total(self):
         return self.product.price * self.quantity
 
@@ -0,0 +1,106 @@
+from django.db import transaction, IntegrityError
+from django.db.models import F
+
+from .models import CartItem
+
+
+# ============================================================
+# THAO TÁC GIỎ HÀNG (add / decrement / remove)
+# Mỗi thao tác là 1 câu UPDATE / DELETE có điều kiện ngay trong DB
+# (quantity = quantity + 1 WHERE quantity < stock), không đọc-sửa-ghi trong Python,
+# nên 2 request cùng lúc (bấm đúp) không ghi đè lên nhau.
+# owner: {'user': user} cho user đã đăng nhập, {'cart': cart} cho giỏ hàng theo session.
+# ============================================================
+ADDED = 'added'
+OUT_OF_STOCK = 'out_of_stock'
+
+
+def _increment(owner, variant, quantity):
+    return CartItem.objects.filter(
+        **owner,
+        variant=variant,
+        quantity__lte=F('variant__stock') - quantity,
+    ).update(quantity=F('quantity') + quantity)
+
+
+def add_item(owner, variant, quantity=1):
+    """Thêm quantity sản phẩm của biến thể vào giỏ, không vượt quá tồn kho. Trả về ADDED / OUT_OF_STOCK."""
+    with transaction.atomic():
+        if _increment(owner, variant, quantity):
+            return ADDED
+
+        if variant.stock < quantity:
+            return OUT_OF_STOCK
+
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(**owner, product_id=variant.product_id, variant=variant, quantity=quantity)
+            return ADDED
+        except IntegrityError:
+            # Đã có dòng này (đang ở mức tồn kho tối đa, hoặc request khác vừa tạo) → thử cộng lại 1 lần
+            return ADDED if _increment(owner, variant, quantity) else OUT_OF_STOCK
+
+
+def decrement_item(owner, item_id):
+    """Giảm 1; nếu chỉ còn 1 thì xoá dòng."""
+    with transaction.atomic():
+        if CartItem.objects.filter(**owner, pk=item_id, quantity__gt=1).update(quantity=F('quantity') - 1):
+            return
+        CartItem.objects.filter(**owner, pk=item_id).delete()
+
+
+def remove_item(owner, item_id):
+    CartItem.objects.filter(**owner, pk=item_id).delete()
+
+
+def merge_session_cart(cart, user):
+    """
+    Gộp giỏ hàng của khách (Cart theo session) vào giỏ hàng của user khi đăng nhập.
+    Khoá gộp là (product_id, variant_id); số lượng sau khi gộp không vượt quá tồn kho biến thể,
+    biến thể đã hết hàng thì dòng đó bị xoá khỏi giỏ hàng của user.
+    Đọc 1 lần mỗi bên, ghi bằng bulk_update + bulk_create, rồi xoá giỏ hàng session.
+    """
+    guest_items = list(CartItem.objects.filter(cart=cart).select_related('variant'))
+    if not guest_items:
+        return
+
+    user_items = {
+        (item.product_id, item.variant_id): item
+        for item in CartItem.objects.filter(user=user)
+    }
+
+    to_update = []
+    updated_ids = set()
+    to_delete = []
+    to_create = []
+    for guest in guest_items:
+        limit = guest.variant.stock if guest.variant else None
+        key = (guest.product_id, guest.variant_id)
+        existing = user_items.get(key)
+
+        if existing is not None:
+            quantity = existing.quantity + guest.quantity
+            existing.quantity = min(quantity, limit) if limit is not None else quantity
+            if existing.quantity <= 0:
+                # Biến thể đã hết hàng → bỏ luôn dòng của user thay vì giữ dòng số lượng 0
+                del user_items[key]
+                if existing.pk is not None:
+                    to_delete.append(existing.pk)
+                continue
+            if existing.pk is not None and existing.pk not in updated_ids:
+                updated_ids.add(existing.pk)
+                to_update.append(existing)
+            continue
+
+        quantity = min(guest.quantity, limit) if limit is not None else guest.quantity
+        if quantity <= 0:
+            continue
+        item = CartItem(user=user, product_id=guest.product_id, variant_id=guest.variant_id, quantity=quantity)
+        user_items[key] = item
+        to_create.append(item)
+
+    with transaction.atomic():
+        CartItem.objects.filter(pk__in=to_delete).delete()
+        CartItem.objects.bulk_update(to_update, ['quantity'])
+        CartItem.objects.bulk_create(to_create)
+        cart.delete()
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+
+from django.contrib import messages
+
+from coupons.models import Coupon
+from coupons.validation import CouponValidator
+
+
+VAT_RATE = 0.08
+
+
+@dataclass(frozen=True)
+class CartPricing:
+    """Kết quả tính tiền giỏ hàng (không đổi sau khi tạo)."""
+    items: tuple
+    total: int
+    quantity: int
+    coupon: Coupon = None
+    eligible_subtotal: float = 0
+    discount_amount: float = 0
+    VAT: float = 0
+    grand_total: float = 0
+    # Coupon trong session không còn hợp lệ (hết hạn, hết lượt...) → lý do để báo cho khách
+    coupon_error: str = ""
+
+    @property
+    def discount_percent(self):
+        return self.coupon.discount if self.coupon else 0
+
+    @property
+    def max_discount(self):
+        return self.coupon.max_discount_amount if self.coupon else 0
+
+    @property
+    def discounted_subtotal(self):
+        return max(self.total - self.discount_amount, 0)
+
+
+class CartPricer:
+    """
+    Tính tiền giỏ hàng dùng chung cho cart, checkout và place_order:
+    - 1 query lấy CartItem kèm product, category, variant
+    - 1 query lấy coupon, rồi CouponValidator kiểm tra trạng thái, ngành hàng, đơn tối thiểu
+      và giới hạn số lần dùng (tối đa 2 query)
+    """
+
+    def __init__(self, cart_items, user=None):
+        self.cart_items = cart_items
+        self.user = user
+
+    def load_items(self):
+        return tuple(self.cart_items.select_related('product__category', 'variant'))
+
+    def get_coupon(self, coupon_id):
+        if not coupon_id:
+            return None
+        return Coupon.objects.filter(pk=coupon_id).first()
+
+    def price(self, coupon_id=None):
+        items = self.load_items()
+
+        total = 0
+        quantity = 0
+        for ci in items:
+            total += ci.product.price * ci.quantity
+            quantity += ci.quantity
+
+        coupon = None
+        coupon_error = ""
+        eligible_subtotal = 0
+        discount_amount = 0
+        if coupon_id and items:
+            check = CouponValidator(self.get_coupon(coupon_id), self.user).validate(items)
+            if check.ok:
+                coupon = check.coupon
+                eligible_subtotal = check.eligible_subtotal
+                discount_amount = check.discount
+            else:
+                coupon_error = check.reason
+
+        discounted_subtotal = max(total - discount_amount, 0)
+        VAT = round(discounted_subtotal * VAT_RATE, 2)
+        grand_total = round(discounted_subtotal + VAT, 2)
+
+        return CartPricing(
+            items=items,
+            total=total,
+            quantity=quantity,
+            coupon=coupon,
+            eligible_subtotal=eligible_subtotal,
+            discount_amount=discount_amount,
+            VAT=VAT,
+            grand_total=grand_total,
+            coupon_error=coupon_error,
+        )
+
+    @classmethod
+    def for_session(cls, cart_items, session, user=None):
+        """Tính tiền theo coupon đang lưu trong session (coupon_id / coupon_percent)."""
+        coupon_id = session.get("coupon_id") if session.get("coupon_percent") else None
+        return cls(cart_items, user).price(coupon_id)
+
+
+def drop_invalid_coupon(request, pricing):
+    """Coupon trong session không còn dùng được → bỏ khỏi session và báo cho khách."""
+    if pricing.coupon_error:
+        request.session.pop("coupon_id", None)
+        request.session.pop("coupon_percent", None)
+        messages.warning(request, pricing.coupon_error)
@@ -1,3 +1,226 @@
-from django.test import TestCase
+import datetime
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account
+from category.models import Category
+from coupons.models import Coupon
+from dkmv.testing import run_concurrently
+from store.models import Product, ProductVariant
+from .models import Cart, CartItem
+from .operations import ADDED, OUT_OF_STOCK, add_item, decrement_item, merge_session_cart
+
+
+def create_customer(username='an'):
+    user = Account.objects.create_user('An', 'Nguyen', username, f'{username}@example.com', 'secret')
+    user.is_active = True
+    user.save()
+    return user
+
+
+class AddCartVariantLookupTests(TestCase):
+    """add_cart tìm biến thể qua color_key / size_key: số query không phụ thuộc số biến thể của sản phẩm."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_customer()
+        category = Category.objects.create(category_name='Áo', slug='ao')
+        cls.products = {}
+        for count in (4, 400):
+            product = Product.objects.create(
+                product_name=f'Áo {count}', slug=f'ao-{count}', price=100, images='x.png', category=category)
+            ProductVariant.objects.bulk_create([
+                ProductVariant(product=product, color=f'C{i}', size=f'S{i}', color_key=f'c{i}', size_key=f's{i}',
+                               stock=100)
+                for i in range(count)
+            ])
+            cls.products[count] = product
+
+    def _repeat_add_queries(self, product, login):
+        if login:
+            self.client.force_login(self.user)
+        url = reverse('add_cart', args=[product.pk])
+        self.client.post(url, {'color': 'C1', 'size': 'S1'}, HTTP_REFERER='/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'color': ' c1 ', 'size': 's1'}, HTTP_REFERER='/')
+        self.assertRedirects(response, reverse('cart'), fetch_redirect_response=False)
+        self.client.logout()
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_variant_count(self):
+        for login in (False, True):
+            with self.subTest(login=login):
+                self.assertEqual(
+                    self._repeat_add_queries(self.products[4], login),
+                    self._repeat_add_queries(self.products[400], login),
+                )
+
+    def test_color_and_size_match_ignoring_case_and_spaces(self):
+        self._repeat_add_queries(self.products[4], login=True)
+        item = CartItem.objects.get(user=self.user)
+        self.assertEqual((item.variant.color, item.variant.size, item.quantity), ('C1', 'S1', 2))
+
+    def test_unknown_product_is_404(self):
+        response = self.client.post(reverse('add_cart', args=[999999]), {'color': 'C1', 'size': 'S1'},
+                                    HTTP_REFERER='/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_variant_redirects_back(self):
+        response = self.client.post(reverse('add_cart', args=[self.products[4].pk]), {'color': 'C9', 'size': 'S1'},
+                                    HTTP_REFERER='/store/')
+        self.assertRedirects(response, '/store/', fetch_redirect_response=False)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class SessionEngineTests(TestCase):
+    """
+    Giỏ hàng + coupon của khách dùng được với mọi DKMV_SESSION_STORAGE (settings.SESSION_ENGINES).
+    Luồng: trang chủ → cửa hàng → chi tiết → thêm vào giỏ 2 lần → áp mã → giỏ hàng.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(category_name='Áo', slug='ao')
+        cls.product = Product.objects.create(
+            product_name='Áo thun', slug='ao-thun', price=100, images='x.png', category=category)
+        cls.variant = ProductVariant.objects.create(product=cls.product, color='Red', size='M', stock=10)
+        now = timezone.now()
+        Coupon.objects.create(code='SAVE10', discount=10, active=True,
+                              valid_from=now - datetime.timedelta(days=1), valid_to=now + datetime.timedelta(days=5))
+
+    def _storefront_flow(self):
+        client = Client()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('home'))
+            client.get(reverse('store'))
+            client.get(self.product.get_url())
+            for _ in range(2):
+                client.post(reverse('add_cart', args=[self.product.pk]), {'color': 'Red', 'size': 'M'},
+                            HTTP_REFERER='/')
+            client.post(reverse('coupons:apply_coupon'), {'code': 'save10'})
+            response = client.get(reverse('cart'))
+        session_queries = [query for query in queries.captured_queries if 'django_session' in query['sql']]
+        return response, len(session_queries)
+
+    def test_cart_and_coupon_survive_every_engine(self):
+        session_queries = {}
+        for storage, engine in settings.SESSION_ENGINES.items():
+            with self.subTest(storage=storage), self.settings(SESSION_ENGINE=engine):
+                response, session_queries[storage] = self._storefront_flow()
+                self.assertEqual(response.context['quantity'], 2)
+                self.assertEqual(response.context['discount_percent'], 10)
+                self.assertEqual(Cart.objects.count(), 1)
+                Cart.objects.all().delete()
+
+        # cached_db đọc session qua cache, signed_cookies không đụng bảng session
+        self.assertLess(session_queries['cached_db'], session_queries['db'])
+        self.assertEqual(session_queries['signed_cookies'], 0)
+
+
+class MergeSessionCartTests(TestCase):
+    """Gộp giỏ hàng của khách vào giỏ hàng của user khi đăng nhập (carts/operations.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_customer()
+        category = Category.objects.create(category_name='Áo', slug='ao')
+        product = Product.objects.create(
+            product_name='Áo thun', slug='ao-thun', price=100, images='x.png', category=category)
+        cls.sold_out = ProductVariant.objects.create(product=product, color='Red', size='M', stock=0)
+        cls.in_stock = ProductVariant.objects.create(product=product, color='Blue', size='M', stock=3)
+
+    def _merge(self, user_lines, guest_lines):
+        cart = Cart.objects.create(cart_id='guest')
+        for variant, quantity in user_lines:
+            CartItem.objects.create(user=self.user, product=variant.product, variant=variant, quantity=quantity)
+        for variant, quantity in guest_lines:
+            CartItem.objects.create(cart=cart, product=variant.product, variant=variant, quantity=quantity)
+        merge_session_cart(cart, self.user)
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+        return dict(CartItem.objects.filter(user=self.user).values_list('variant_id', 'quantity'))
+
+    def test_sold_out_variant_removes_existing_user_line(self):
+        lines = self._merge([(self.sold_out, 2), (self.in_stock, 1)], [(self.sold_out, 1), (self.in_stock, 1)])
+        self.assertEqual(lines, {self.in_stock.pk: 2})
+
+    def test_merged_quantity_is_capped_at_stock(self):
+        lines = self._merge([(self.in_stock, 2)], [(self.in_stock, 2)])
+        self.assertEqual(lines, {self.in_stock.pk: 3})
+
+    def test_sold_out_guest_line_is_not_copied(self):
+        lines = self._merge([], [(self.sold_out, 1), (self.in_stock, 1)])
+        self.assertEqual(lines, {self.in_stock.pk: 1})
+
+
+class CartCountBadgeTests(TestCase):
+    """Badge giỏ hàng của user đã đăng nhập: lấy từ session trong CART_COUNT_SESSION_TIMEOUT, không query cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_customer()
+        category = Category.objects.create(category_name='Áo', slug='ao')
+        product = Product.objects.create(
+            product_name='Áo thun', slug='ao-thun', price=100, images='x.png', category=category)
+        cls.variant = ProductVariant.objects.create(product=product, color='Red', size='M', stock=10)
+
+    def _badge_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        sql = [query['sql'] for query in queries.captured_queries]
+        return response.context['cart_count'], [q for q in sql if 'dkmv_cache' in q or 'carts_cartitem' in q]
+
+    def test_warm_badge_makes_no_cache_queries(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('add_cart', args=[self.variant.product_id]), {'color': 'Red', 'size': 'M'},
+                         HTTP_REFERER='/')
+
+        self.assertEqual(self._badge_queries(), (1, []))
+
+    def test_badge_rechecks_shared_count_after_timeout(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        CartItem.objects.create(user=self.user, product=self.variant.product, variant=self.variant, quantity=2)
+        cache.delete(f'cart:count:{self.user.pk}')  # giỏ hàng bị sửa ở worker / thiết bị khác
+
+        with mock.patch('carts.utils.CART_COUNT_SESSION_TIMEOUT', 0):
+            count, _ = self._badge_queries()
+        self.assertEqual(count, 2)
+
+
+class CartConcurrencyTests(TransactionTestCase):
+    """
+    add_item / decrement_item chạy song song trên cùng 1 biến thể: UPDATE có điều kiện + unique constraint
+    (user, variant) giữ đúng 1 dòng và không vượt tồn kho. Mỗi thread dùng connection DB riêng.
+    """
+
+    def setUp(self):
+        self.user = create_customer()
+        category = Category.objects.create(category_name='Áo', slug='ao')
+        product = Product.objects.create(
+            product_name='Áo thun', slug='ao-thun', price=100, images='x.png', category=category)
+        self.variant = ProductVariant.objects.create(product=product, color='Red', size='M', stock=25)
+        self.owner = {'user': self.user}
+
+    def test_concurrent_adds_keep_one_line_within_stock(self):
+        results = run_concurrently([lambda: add_item(self.owner, self.variant)] * 40)
+
+        self.assertEqual(Counter(results), Counter({ADDED: 25, OUT_OF_STOCK: 15}))
+        self.assertEqual(
+            list(CartItem.objects.filter(user=self.user).values_list('quantity', flat=True)), [25])
+
+    def test_concurrent_add_and_decrement(self):
+        item = CartItem.objects.create(user=self.user, product=self.variant.product, variant=self.variant, quantity=10)
+        calls = [lambda: add_item(self.owner, self.variant)] * 10 + [lambda: decrement_item(self.owner, item.pk)] * 8
+        results = run_concurrently(calls)
+
+        self.assertEqual(Counter(results), Counter({ADDED: 10, None: 8}))
+        self.assertEqual(
+            list(CartItem.objects.filter(user=self.user).values_list('quantity', flat=True)), [12])
@@ -0,0 +1,125 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils.crypto import get_random_string
+
+from .models import CartItem
+
+
+# ============================================================
+# CART ID CỦA KHÁCH (lưu trong session, dùng được với mọi SESSION_ENGINE)
+# - Engine có session key cố định (db, cached_db, cache, file): cart_id = session key
+#   (reap_carts dựa vào đó để biết giỏ hàng nào còn session sống)
+# - signed_cookies: session key đổi sau mỗi lần ghi → sinh cart_id ngẫu nhiên
+# cart_id luôn được ghi vào session['cart_id']; các giỏ hàng cũ (chưa có key này) vẫn đọc theo session key.
+# ============================================================
+CART_ID_SESSION_KEY = 'cart_id'
+COOKIE_SESSION_ENGINES = ('django.contrib.sessions.backends.signed_cookies',)
+
+
+def get_session_cart_id(request):
+    """cart_id của khách nếu đã có, không thì None – không tạo session."""
+    if not request.session.session_key:
+        return None
+    return request.session.get(CART_ID_SESSION_KEY) or request.session.session_key
+
+
+def allocate_session_cart_id(request):
+    """cart_id của khách, tạo mới (kèm session) nếu chưa có – chỉ gọi khi giỏ hàng bị thay đổi."""
+    cart_id = request.session.get(CART_ID_SESSION_KEY)
+    if cart_id:
+        return cart_id
+
+    if settings.SESSION_ENGINE in COOKIE_SESSION_ENGINES:
+        cart_id = get_random_string(32)
+    else:
+        if not request.session.session_key:
+            request.session.create()
+        cart_id = request.session.session_key
+    request.session[CART_ID_SESSION_KEY] = cart_id
+    return cart_id
+
+
+# ============================================================
+# SỐ LƯỢNG TRÊN BADGE GIỎ HÀNG
+# - Khách vãng lai: lưu trong session
+# - User đã đăng nhập: lưu trong cache dùng chung (settings.CACHES) theo user id → mọi worker và
+#   mọi thiết bị của user thấy cùng 1 số. Session giữ thêm 1 bản sao, được tin trong
+#   CART_COUNT_SESSION_TIMEOUT giây (session đã được đọc sẵn mỗi request → không thêm query);
+#   hết thời gian đó mới hỏi lại cache dùng chung, nên thiết bị khác của user thấy số mới chậm nhất chừng đó.
+# Các view thay đổi giỏ hàng gọi sync_cart_count() để cập nhật lại; giỏ hàng bị sửa ngoài các view đó
+# (admin, dọn giỏ hàng) thì số cũ tự hết hạn sau CART_COUNT_CACHE_TIMEOUT.
+# ============================================================
+CART_COUNT_SESSION_KEY = 'cart_count'
+CART_COUNT_CHECKED_SESSION_KEY = 'cart_count_checked'
+CART_COUNT_SESSION_TIMEOUT = 60
+CART_COUNT_CACHE_TIMEOUT = 60 * 60
+
+
+def _user_cart_count_key(user_id):
+    return f'cart:count:{user_id}'
+
+
+def _count_cart_items(**filters):
+    return CartItem.objects.filter(**filters).aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def _remember_user_cart_count(request, count):
+    request.session[CART_COUNT_SESSION_KEY] = count
+    request.session[CART_COUNT_CHECKED_SESSION_KEY] = int(time.time())
+
+
+def _store_user_cart_count(request, user, count):
+    cache.set(_user_cart_count_key(user.pk), count, CART_COUNT_CACHE_TIMEOUT)
+    _remember_user_cart_count(request, count)
+
+
+def get_cart_count(request):
+    if request.user.is_authenticated:
+        # Số trong session của khách vãng lai (trước khi đăng nhập) không có mốc kiểm tra → hỏi lại
+        checked = request.session.get(CART_COUNT_CHECKED_SESSION_KEY, 0)
+        if time.time() - checked < CART_COUNT_SESSION_TIMEOUT:
+            return request.session[CART_COUNT_SESSION_KEY]
+
+        count = cache.get(_user_cart_count_key(request.user.pk))
+        if count is None:
+            count = _count_cart_items(user=request.user)
+            cache.set(_user_cart_count_key(request.user.pk), count, CART_COUNT_CACHE_TIMEOUT)
+        _remember_user_cart_count(request, count)
+        return count
+
+    count = request.session.get(CART_COUNT_SESSION_KEY)
+    if count is None:
+        cart_id = get_session_cart_id(request)
+        if not cart_id:
+            return 0  # chưa có session thì chắc chắn chưa có giỏ hàng
+        count = _count_cart_items(cart__cart_id=cart_id)
+        request.session[CART_COUNT_SESSION_KEY] = count
+    return count
+
+
+def sync_cart_count(request, user=None):
+    """Tính lại và lưu số lượng sau khi giỏ hàng thay đổi."""
+    user = user or request.user
+    if user.is_authenticated:
+        count = _count_cart_items(user=user)
+        _store_user_cart_count(request, user, count)
+        return count
+
+    cart_id = get_session_cart_id(request)
+    if not cart_id:
+        return 0  # không ghi vào session → không tạo session cho khách chưa có giỏ hàng
+    count = _count_cart_items(cart__cart_id=cart_id)
+    request.session[CART_COUNT_SESSION_KEY] = count
+    return count
+
+
+def reset_cart_count(request, user=None):
+    """Giỏ hàng vừa bị xoá hết (đặt hàng xong)."""
+    user = user or request.user
+    if user.is_authenticated:
+        _store_user_cart_count(request, user, 0)
+    elif request.session.session_key:
+        request.session[CART_COUNT_SESSION_KEY] = 0
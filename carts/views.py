@@ -2,10 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 
-from store.models import Product, ProductVariant
+from store.models import Product
+from store.variants import resolve_variant
 from .models import Cart, CartItem
+from .utils import sync_cart_count, get_session_cart_id, allocate_session_cart_id
+from .operations import add_item, decrement_item, remove_item, OUT_OF_STOCK
+from .pricing import CartPricer, drop_invalid_coupon
 from coupons.forms import CouponCodeForm
-from coupons.models import Coupon
 
 
 
@@ -13,11 +16,32 @@ from coupons.models import Coupon
 # ============================================================
 # SESSION CART ID
 # ============================================================
+# Chỉ tạo session khi giỏ hàng thực sự bị thay đổi (add_cart); các trang chỉ đọc
+# dùng _session_cart() để không ghi django_session cho khách / bot chỉ xem hàng.
 def _cart_id(request):
-    cart = request.session.session_key
-    if not cart:
-        cart = request.session.create()
-    return cart
+    return allocate_session_cart_id(request)
+
+
+def _session_cart(request):
+    """Cart của khách nếu đã có session và giỏ hàng, không thì None (không tạo gì cả)."""
+    cart_id = get_session_cart_id(request)
+    if not cart_id:
+        return None
+    return Cart.objects.filter(cart_id=cart_id).first()
+
+
+def _cart_owner(request, create=False):
+    """
+    Điều kiện lọc CartItem của người đang xem (xem carts/operations.py).
+    Khách chưa có giỏ hàng và create=False → None.
+    """
+    if request.user.is_authenticated:
+        return {"user": request.user}
+    if create:
+        cart, _ = Cart.objects.get_or_create(cart_id=_cart_id(request))
+        return {"cart": cart}
+    cart = _session_cart(request)
+    return {"cart": cart} if cart else None
 
 
 # ============================================================
@@ -30,70 +54,30 @@ def add_cart(request, product_id):
         return redirect('dashboard')
     # ============================
 
-    product = get_object_or_404(Product, id=product_id)
-
     color = request.POST.get("color")
     size = request.POST.get("size")
 
     if not color or not size:
+        get_object_or_404(Product, id=product_id)
         messages.error(request, "Vui lòng chọn màu và size.")
         return redirect(request.META.get("HTTP_REFERER"))
 
-    # Tìm biến thể theo màu & size (không phân biệt hoa thường)
-    try:
-        variant = ProductVariant.objects.get(
-            product=product,
-            color__iexact=color,
-            size__iexact=size,
-        )
-    except ProductVariant.DoesNotExist:
+    # Tìm biến thể theo màu & size (không phân biệt hoa thường), lấy kèm product – 1 query
+    variant = resolve_variant(product_id, color, size)
+    if variant is None:
+        get_object_or_404(Product, id=product_id)
         messages.error(request, "Biến thể không tồn tại.")
         return redirect(request.META.get("HTTP_REFERER"))
 
-
     # Hết hàng
     if variant.stock <= 0:
         messages.warning(request, "Biến thể này đã hết hàng.")
         return redirect(request.META.get("HTTP_REFERER"))
 
-    # User đã đăng nhập
-    if request.user.is_authenticated:
-        user = request.user
-
-        try:
-            cart_item = CartItem.objects.get(
-                user=user, product=product, variant=variant
-            )
-            if cart_item.quantity < variant.stock:
-                cart_item.quantity += 1
-                cart_item.save()
-            else:
-                messages.warning(request, "Không đủ hàng trong kho.")
-        except CartItem.DoesNotExist:
-            CartItem.objects.create(
-                user=user, product=product, variant=variant, quantity=1
-            )
-
-        return redirect("cart")
-
-    # User chưa đăng nhập (session cart)
-    cart_id = _cart_id(request)
-    cart, _ = Cart.objects.get_or_create(cart_id=cart_id)
-
-    try:
-        cart_item = CartItem.objects.get(
-            cart=cart, product=product, variant=variant
-        )
-        if cart_item.quantity < variant.stock:
-            cart_item.quantity += 1
-            cart_item.save()
-        else:
-            messages.warning(request, "Không đủ hàng trong kho.")
-    except CartItem.DoesNotExist:
-        CartItem.objects.create(
-            cart=cart, product=product, variant=variant, quantity=1
-        )
+    if add_item(_cart_owner(request, create=True), variant) == OUT_OF_STOCK:
+        messages.warning(request, "Không đủ hàng trong kho.")
 
+    sync_cart_count(request)
     return redirect("cart")
 
 # ============================================================
@@ -106,25 +90,11 @@ def remove_cart(request, product_id, cart_item_id):
         return redirect('dashboard')
     # ============================
 
-    product = get_object_or_404(Product, id=product_id)
-
-    try:
-        if request.user.is_authenticated:
-            cart_item = CartItem.objects.get(id=cart_item_id, user=request.user)
-
-        else:
-            cart = Cart.objects.get(cart_id=_cart_id(request))
-            cart_item = CartItem.objects.get(id=cart_item_id, cart=cart)
-
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            cart_item.save()
-        else:
-            cart_item.delete()
-
-    except:
-        pass
+    owner = _cart_owner(request)
+    if owner:
+        decrement_item(owner, cart_item_id)
 
+    sync_cart_count(request)
     return redirect("cart")
 
 
@@ -139,17 +109,11 @@ def remove_cart_item(request, product_id, cart_item_id):
         return redirect('dashboard')
     # ============================
 
-    try:
-        if request.user.is_authenticated:
-            cart_item = CartItem.objects.get(id=cart_item_id, user=request.user)
-        else:
-            cart = Cart.objects.get(cart_id=_cart_id(request))
-            cart_item = CartItem.objects.get(id=cart_item_id, cart=cart)
-
-        cart_item.delete()
-    except:
-        pass
+    owner = _cart_owner(request)
+    if owner:
+        remove_item(owner, cart_item_id)
 
+    sync_cart_count(request)
     return redirect("cart")
 
 
@@ -161,7 +125,9 @@ def _get_cart_items_qs(request):
     if request.user.is_authenticated:
         return CartItem.objects.filter(user=request.user, is_active=True)
 
-    cart = Cart.objects.get(cart_id=_cart_id(request))
+    cart = _session_cart(request)
+    if cart is None:
+        return CartItem.objects.none()
     return CartItem.objects.filter(cart=cart, is_active=True)
 
 
@@ -169,48 +135,21 @@ def _get_cart_items_qs(request):
 # ============================================================
 # CART PAGE
 # ============================================================
-def cart(request, total=0, quantity=0):
-
-    try:
-        cart_items = _get_cart_items_qs(request)
-
-        for ci in cart_items:
-            total += ci.product.price * ci.quantity
-            quantity += ci.quantity
-
-        coupon_id = request.session.get("coupon_id")
-        coupon_percent = int(request.session.get("coupon_percent", 0))
-        discount_amount = 0
-
-        if coupon_id and coupon_percent:
-            try:
-                coupon = Coupon.objects.get(pk=coupon_id, active=True)
-                eligible_subtotal = coupon.eligible_subtotal(cart_items)
-                discount_amount = round(eligible_subtotal * (coupon_percent / 100), 2)
-            except Coupon.DoesNotExist:
-                pass
-
-        discounted_subtotal = max(total - discount_amount, 0)
-        VAT = round(discounted_subtotal * 0.08, 2)
-        grand_total = round(discounted_subtotal + VAT, 2)
-
-    except:
-        cart_items = []
-        discount_amount = 0
-        VAT = 0
-        grand_total = 0
+def cart(request):
+    pricing = CartPricer.for_session(_get_cart_items_qs(request), request.session, request.user)
+    drop_invalid_coupon(request, pricing)
 
     context = {
-        "total": total,
-        "quantity": quantity,
-        "cart_items": cart_items,
-        "discount_amount": discount_amount,
-        "discount_percent": request.session.get("coupon_percent", 0),
-        "VAT": VAT,
-        "grand_total": grand_total,
+        "total": pricing.total,
+        "quantity": pricing.quantity,
+        "cart_items": pricing.items,
+        "VAT": pricing.VAT,
+        "grand_total": pricing.grand_total,
+        "discount_percent": pricing.discount_percent,
+        "discount_amount": pricing.discount_amount,
+        "max_discount": pricing.max_discount,
         "coupon_form": CouponCodeForm(),
     }
-
     return render(request, "store/cart.html", context)
 
 
@@ -219,163 +158,23 @@ def cart(request, total=0, quantity=0):
 # CHECKOUT PAGE
 # ============================================================
 @login_required(login_url="login")
-def checkout(request, total=0, quantity=0):
+def checkout(request):
     # ===== CHẶN ADMIN/STAFF =====
     if request.user.role in ['admin', 'staff']:
         messages.error(request, 'Admin/Staff không thể đặt hàng. Vui lòng tạo tài khoản khách hàng riêng.')
         return redirect('dashboard')
     # ============================
-    cart_items = _get_cart_items_qs(request)
-
-    for ci in cart_items:
-        total += ci.product.price * ci.quantity
-        quantity += ci.quantity
-
-    coupon_id = request.session.get("coupon_id")
-    coupon_percent = int(request.session.get("coupon_percent", 0))
-    discount_amount = 0
-
-    if coupon_id and coupon_percent:
-        try:
-            coupon = Coupon.objects.get(pk=coupon_id, active=True)
-            eligible_subtotal = coupon.eligible_subtotal(cart_items)
-            discount_amount = round(eligible_subtotal * (coupon_percent / 100), 2)
-        except Coupon.DoesNotExist:
-            pass
-
-    discounted_subtotal = max(total - discount_amount, 0)
-    VAT = round(discounted_subtotal * 0.08, 2)
-    grand_total = round(discounted_subtotal + VAT, 2)
+    pricing = CartPricer.for_session(_get_cart_items_qs(request), request.session, request.user)
+    drop_invalid_coupon(request, pricing)
 
     context = {
-        "total": total,
-        "quantity": quantity,
-        "cart_items": cart_items,
-        "discount_amount": discount_amount,
-        "discount_percent": coupon_percent,
-        "VAT": VAT,
-        "grand_total": grand_total,
+        "total": pricing.total,
+        "quantity": pricing.quantity,
+        "cart_items": pricing.items,
+        "VAT": pricing.VAT,
+        "grand_total": pricing.grand_total,
+        "discount_percent": pricing.discount_percent,
+        "discount_amount": pricing.discount_amount,
+        "max_discount": pricing.max_discount,
     }
-
     return render(request, "store/checkout.html", context)
-
-def cart(request, total=0, quantity=0, cart_items=None):
-   try:
-       cart_items = _get_cart_items_qs(request)
-
-
-       for ci in cart_items:
-           # total là tổng của TẤT CẢ sản phẩm trong giỏ
-           total += ci.product.price * ci.quantity
-           quantity += ci.quantity
-
-
-       coupon_id = request.session.get("coupon_id")
-       coupon_percent = int(request.session.get("coupon_percent", 0))
-       discount_amount = 0
-       max_discount = 0  # truyền ra template
-
-
-       if coupon_id and coupon_percent:
-           try:
-               coupon = Coupon.objects.get(pk=coupon_id, active=True)
-
-
-               # Tính tổng phụ đủ điều kiện áp dụng
-               eligible_subtotal = coupon.eligible_subtotal(cart_items)
-
-
-               # Gọi method tính toán đã bao gồm max_discount_amount
-               discount_amount = round(
-                   coupon.get_discount_value(eligible_subtotal), 2
-               )
-               max_discount = coupon.max_discount_amount
-
-
-           except Coupon.DoesNotExist:
-               coupon_percent = 0
-               max_discount = 0
-
-
-       discounted_subtotal = max(total - discount_amount, 0)
-       VAT = round(0.08 * discounted_subtotal, 2)
-       grand_total = round(discounted_subtotal + VAT, 2)
-
-
-   except Exception:
-       # Nếu có lỗi: tránh vỡ page
-       cart_items = []
-       coupon_percent = 0
-       discount_amount = 0
-       VAT = 0
-       grand_total = 0
-       max_discount = 0
-
-
-   context = {
-       "total": total,
-       "quantity": quantity,
-       "cart_items": cart_items,
-       "VAT": VAT,
-       "grand_total": grand_total,
-       "discount_percent": coupon_percent,
-       "discount_amount": discount_amount,
-       "max_discount": max_discount,
-       "coupon_form": CouponCodeForm(),
-   }
-   return render(request, "store/cart.html", context)
-
-
-
-
-@login_required(login_url='login')
-def checkout(request, total=0, quantity=0, cart_items=None):
-   cart_items = _get_cart_items_qs(request)
-
-
-   for ci in cart_items:
-       total += ci.product.price * ci.quantity
-       quantity += ci.quantity
-
-
-   coupon_id = request.session.get("coupon_id")
-   coupon_percent = int(request.session.get("coupon_percent", 0))
-   discount_amount = 0
-   max_discount = 0
-
-
-   if coupon_id and coupon_percent:
-       try:
-           coupon = Coupon.objects.get(pk=coupon_id, active=True)
-           eligible_subtotal = coupon.eligible_subtotal(cart_items)
-
-
-           discount_amount = round(
-               coupon.get_discount_value(eligible_subtotal), 2
-           )
-           max_discount = coupon.max_discount_amount
-
-
-       except Coupon.DoesNotExist:
-           coupon_percent = 0
-           max_discount = 0
-
-
-   discounted_subtotal = max(total - discount_amount, 0)
-   VAT = round(0.08 * discounted_subtotal, 2)
-   grand_total = round(discounted_subtotal + VAT, 2)
-
-
-   context = {
-       "total": total,
-       "quantity": quantity,
-       "cart_items": cart_items,
-       "VAT": VAT,
-       "grand_total": grand_total,
-       "discount_percent": coupon_percent,
-       "discount_amount": discount_amount,
-       "max_discount": max_discount,
-   }
-   return render(request, "store/checkout.html", context)
-
-
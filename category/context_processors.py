@@ -1,6 +1,5 @@
-
-from .models import Category
+from .menu import get_menu_links
 
 def menu_links(request):
-    links = Category.objects.all()
+    links = get_menu_links()
     return dict(links=links)
@@ -0,0 +1,43 @@
+from django.core.cache import cache
+
+from dkmv.cache import bump_version, get_version
+from .models import Category
+
+
+# Danh mục trên navbar được cache 2 tầng:
+#   1. Bộ nhớ của process (_local) – không query nào khi version chưa đổi
+#   2. Django cache (settings.CACHES, dùng chung giữa các process) – key gắn với version
+# Mỗi lần Category thay đổi, version tăng lên nên cache cũ tự hết hiệu lực ở mọi process.
+# Version chỉ được hỏi lại cache dùng chung sau MENU_VERSION_LOCAL_TIMEOUT giây → process khác
+# thấy menu mới chậm nhất chừng đó. Với DKMV_CACHE_STORAGE='locmem' mỗi process có version riêng
+# → chỉ đúng khi chạy 1 process; MENU_CACHE_TIMEOUT giới hạn thời gian menu cũ.
+MENU_VERSION_KEY = 'category:menu:version'
+MENU_VERSION_LOCAL_TIMEOUT = 30
+MENU_CACHE_TIMEOUT = 60 * 10
+
+_local = {}
+
+
+def get_menu_version():
+    return get_version(MENU_VERSION_KEY, MENU_VERSION_LOCAL_TIMEOUT)
+
+
+def bump_menu_version():
+    bump_version(MENU_VERSION_KEY)
+    _local.clear()
+
+
+def get_menu_links():
+    version = get_menu_version()
+    if _local.get('version') == version:
+        return _local['links']
+
+    key = f'category:menu:{version}'
+    links = cache.get(key)
+    if links is None:
+        links = list(Category.objects.all())
+        cache.set(key, links, MENU_CACHE_TIMEOUT)
+
+    _local['version'] = version
+    _local['links'] = links
+    return links
@@ -1,3 +1,38 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .menu import get_menu_links
+from .models import Category
+
+
+class MenuCacheTests(TestCase):
+    """Menu danh mục (category/menu.py): khi đã ấm, đọc từ bộ nhớ process, không query nào."""
+
+    def test_warm_menu_makes_no_queries(self):
+        Category.objects.create(category_name='Áo', slug='ao')
+        get_menu_links()
+
+        with CaptureQueriesContext(connection) as queries:
+            links = get_menu_links()
+
+        self.assertEqual([category.slug for category in links], ['ao'])
+        self.assertEqual(len(queries), 0)
+
+    def test_category_change_is_seen_by_this_process(self):
+        Category.objects.create(category_name='Áo', slug='ao')
+        get_menu_links()
+        Category.objects.create(category_name='Quần', slug='quan')
+
+        self.assertEqual(sorted(category.slug for category in get_menu_links()), ['ao', 'quan'])
+
+    def test_warm_home_page_does_not_read_menu_from_db(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('home'))
+
+        # Chỉ còn query danh sách sản phẩm của trang chủ
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len(sql), 1, sql)
+        self.assertIn('FROM "store_product"', sql[0])
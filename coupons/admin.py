@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django import forms
-from .models import Coupon, CouponUsage
+from .models import Coupon, CouponUsage, normalize_code
 
 class CouponAdminForm(forms.ModelForm):
    class Meta:
@@ -8,6 +8,11 @@ class CouponAdminForm(forms.ModelForm):
        fields = "__all__"
 
 
+   def clean_code(self):
+       # Chuẩn hoá trước khi kiểm tra trùng mã (unique) → "giam20k" và "GIAM20K" là 1 mã
+       return normalize_code(self.cleaned_data["code"])
+
+
    def clean(self):
        cleaned = super().clean()
 
@@ -98,6 +103,7 @@ class CouponAdmin(admin.ModelAdmin):
        "applies_to",
        "min_purchase_amount",
        "max_usage_count",
+       "redeemed_count",
        "max_usage_per_customer",
        "valid_from",
        "valid_to",
@@ -111,6 +117,7 @@ class CouponAdmin(admin.ModelAdmin):
    )
    search_fields = ("code", "applies_to")
    filter_horizontal = ("categories",)
+   readonly_fields = ("redeemed_count",)
 
 
    fieldsets = (
@@ -131,6 +138,7 @@ class CouponAdmin(admin.ModelAdmin):
            "fields": (
                "max_usage_count",
                "max_usage_per_customer",
+               "redeemed_count",
            )
        }),
        ("Phạm vi áp dụng", {
@@ -0,0 +1,137 @@
+import csv
+import random
+
+from django.db import IntegrityError, transaction
+
+from .models import Coupon, normalize_code
+from .wallet import bump_wallet_version
+
+
+# ============================================================
+# TẠO MÃ HÀNG LOẠT (chiến dịch mã dùng 1 lần)
+# Sinh mã ngẫu nhiên trong bộ nhớ, chỉ kiểm tra các mã vừa sinh với DB (code IN (..) theo từng phần,
+# không đọc cả bảng coupon), ghi bằng bulk_create theo batch, ngành hàng áp dụng chung ghi vào
+# bảng trung gian coupon_categories cũng bằng bulk_create. Xuất danh sách ra CSV.
+# ============================================================
+# Bỏ các ký tự dễ nhầm: 0/O, 1/I/L
+CODE_ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+CODE_LENGTH = Coupon._meta.get_field("code").max_length
+MIN_RANDOM_LENGTH = 6
+MAX_PREFIX_LENGTH = CODE_LENGTH - MIN_RANDOM_LENGTH
+COUPON_BATCH_SIZE = 1000
+# Số mã mỗi câu code IN (..) (dưới giới hạn 999 tham số của SQLite cũ)
+CODE_CHECK_CHUNK_SIZE = 900
+# Số lần ghi lại khi mã bị tạo trùng bởi request / lệnh khác chạy cùng lúc
+COUPON_BATCH_RETRIES = 3
+
+CSV_FIELDS = ("code", "discount", "valid_from", "valid_to", "max_usage_count", "max_usage_per_customer")
+
+_random = random.SystemRandom()
+
+
+def _existing_codes(codes):
+    """Các mã trong codes (đã chuẩn hoá) đã có trong DB – code IN (..) theo unique index, từng phần."""
+    codes = list(codes)
+    existing = set()
+    for start in range(0, len(codes), CODE_CHECK_CHUNK_SIZE):
+        chunk = codes[start:start + CODE_CHECK_CHUNK_SIZE]
+        existing.update(Coupon.objects.filter(code__in=chunk).values_list("code", flat=True))
+    return existing
+
+
+def generate_codes(count, prefix=""):
+    """count mã mới dạng PREFIX + ký tự ngẫu nhiên (tổng CODE_LENGTH ký tự), không trùng mã đã có."""
+    prefix = normalize_code(prefix)
+    if len(prefix) > MAX_PREFIX_LENGTH:
+        raise ValueError(f"Tiền tố tối đa {MAX_PREFIX_LENGTH} ký tự.")
+
+    random_length = CODE_LENGTH - len(prefix)
+    codes = set()
+    while len(codes) < count:
+        candidates = set()
+        while len(codes) + len(candidates) < count:
+            code = prefix + "".join(_random.choices(CODE_ALPHABET, k=random_length))
+            if code not in codes:
+                candidates.add(code)
+        # Mã ngẫu nhiên hiếm khi trùng mã đã có → thường chỉ 1 lượt kiểm tra
+        codes.update(candidates - _existing_codes(candidates))
+    return list(codes)
+
+
+def read_codes_csv(fileobj):
+    """Đọc mã từ cột đầu tiên của file CSV (bỏ dòng tiêu đề 'code', dòng trống, mã trùng)."""
+    codes = {}
+    for row in csv.reader(fileobj):
+        if not row:
+            continue
+        code = normalize_code(row[0])
+        if code and code != "CODE":
+            codes[code] = None
+    return list(codes)
+
+
+def _insert_coupon_categories(coupon_ids, category_ids, batch_size):
+    """Mỗi coupon x mỗi ngành hàng là 1 dòng của bảng trung gian (bulk_create tự chia batch theo giới hạn của DB)."""
+    through = Coupon.categories.through
+    through.objects.bulk_create([
+        through(coupon_id=coupon_id, category_id=category_id)
+        for coupon_id in coupon_ids for category_id in category_ids
+    ], batch_size=batch_size)
+
+
+def _insert_coupons(coupons, category_ids, batch_size):
+    """Ghi coupon + bảng trung gian ngành hàng trong 1 transaction (lỗi thì không ghi gì)."""
+    with transaction.atomic():
+        created = Coupon.objects.bulk_create(coupons, batch_size=batch_size)
+
+        if category_ids and created:
+            if created[0].pk is None:
+                # Backend không trả id sau bulk_create → đọc lại theo mã
+                ids = dict(Coupon.objects.filter(code__in=[c.code for c in created]).values_list("code", "pk"))
+                for coupon in created:
+                    coupon.pk = ids[coupon.code]
+            _insert_coupon_categories([coupon.pk for coupon in created], category_ids, batch_size)
+    return created
+
+
+def create_coupon_batch(codes, template, categories=(), batch_size=COUPON_BATCH_SIZE):
+    """
+    Tạo 1 Coupon cho mỗi mã trong codes, các trường khác lấy từ template (dict field → giá trị).
+    Mã đã tồn tại (không phân biệt hoa thường) hoặc dài quá CODE_LENGTH bị bỏ qua. Mã bị request / lệnh
+    khác tạo trùng lúc đang ghi (IntegrityError) cũng bị bỏ qua, rồi ghi lại (tối đa COUPON_BATCH_RETRIES lần).
+    Trả về (danh sách Coupon đã tạo, danh sách mã bị bỏ qua).
+    """
+    codes = [normalize_code(code) for code in codes]
+    skipped = {code for code in codes if len(code) > CODE_LENGTH}
+    skipped |= _existing_codes(code for code in codes if code not in skipped)
+    category_ids = [getattr(category, "pk", category) for category in categories]
+
+    for attempt in range(COUPON_BATCH_RETRIES):
+        coupons = [Coupon(code=code, **template) for code in codes if code not in skipped]
+        try:
+            created = _insert_coupons(coupons, category_ids, batch_size)
+            break
+        except IntegrityError:
+            # Mã vừa được tạo ở nơi khác sau lượt kiểm tra trên → bỏ qua các mã đó rồi ghi lại
+            clashed = _existing_codes(coupon.code for coupon in coupons)
+            if not clashed or attempt == COUPON_BATCH_RETRIES - 1:
+                raise
+            skipped |= clashed
+
+    # bulk_create không gửi post_save → tự làm mới cache "Coupon của tôi"
+    bump_wallet_version()
+    return created, [code for code in codes if code in skipped]
+
+
+def write_coupons_csv(coupons, fileobj):
+    writer = csv.writer(fileobj)
+    writer.writerow(CSV_FIELDS)
+    for coupon in coupons:
+        writer.writerow([
+            coupon.code,
+            coupon.discount,
+            coupon.valid_from.isoformat(),
+            coupon.valid_to.isoformat(),
+            coupon.max_usage_count,
+            coupon.max_usage_per_customer,
+        ])
@@ -1,5 +1,13 @@
 from django import forms
 
+from .admin import CouponAdminForm
+from .bulk import MAX_PREFIX_LENGTH
+from .models import normalize_code
+
+# Số mã tối đa mỗi lần tạo hàng loạt từ trang quản lý: request web phải trả CSV trong vài giây.
+# Chiến dịch lớn hơn chạy bằng lệnh python manage.py generate_coupons (không bị giới hạn thời gian request).
+COUPON_BATCH_MAX_COUNT = 2000
+
 class CouponCodeForm(forms.Form):
    code = forms.CharField(
        label="",
@@ -11,4 +19,28 @@ class CouponCodeForm(forms.Form):
    )
 
    def clean_code(self):
-       return self.cleaned_data["code"].strip().upper()
+       return normalize_code(self.cleaned_data["code"])
+
+
+class CouponBatchForm(CouponAdminForm):
+   """Tạo mã hàng loạt: mọi trường của Coupon trừ code, cộng số lượng + tiền tố mã."""
+   count = forms.IntegerField(
+       label="Số lượng mã", min_value=1, max_value=COUPON_BATCH_MAX_COUNT,
+       error_messages={"max_value": f"Tối đa {COUPON_BATCH_MAX_COUNT} mã mỗi lần, nhiều hơn hãy dùng lệnh "
+                                    f"python manage.py generate_coupons."},
+   )
+   prefix = forms.CharField(
+       label="Tiền tố", max_length=MAX_PREFIX_LENGTH, required=False,
+       help_text=f"Tối đa {MAX_PREFIX_LENGTH} ký tự, phần còn lại của mã được sinh ngẫu nhiên.",
+   )
+
+   class Meta(CouponAdminForm.Meta):
+       exclude = ("code",)
+
+   def __init__(self, *args, **kwargs):
+       super().__init__(*args, **kwargs)
+       # Chiến dịch hàng loạt: mặc định mỗi mã dùng 1 lần
+       self.fields["max_usage_count"].initial = 1
+
+   def clean_prefix(self):
+       return normalize_code(self.cleaned_data["prefix"])
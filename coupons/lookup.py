@@ -0,0 +1,67 @@
+import time
+
+from django.core.cache import cache
+
+from dkmv.cache import bump_version, get_version
+from .models import Coupon, normalize_code
+
+
+# Tra cứu coupon theo mã (apply_coupon), cache theo từng mã trong COUPON_CACHE_TIMEOUT giây:
+# coupon (giảm giá, thời gian hiệu lực, giới hạn) kèm sẵn category_ids, mã không tồn tại cũng được cache.
+# Cache 2 tầng giống menu danh mục (category/menu.py):
+#   1. Bộ nhớ của process (_local) – mã nóng không tốn query nào
+#   2. Django cache (settings.CACHES, dùng chung giữa các process)
+# Version tăng khi Coupon / ngành hàng của coupon thay đổi (coupon_update, coupon_delete, admin...)
+# hoặc khi mã hết lượt / được trả lượt (coupons/redemption.py) → mọi mã cũ tự hết hiệu lực; process khác
+# thấy version mới chậm nhất COUPON_VERSION_LOCAL_TIMEOUT giây.
+# redeemed_count trong cache có thể cũ tối đa COUPON_CACHE_TIMEOUT giây; giới hạn thật được chặn
+# lúc chốt đơn (redeem_coupon).
+COUPON_VERSION_KEY = 'coupons:code:version'
+COUPON_VERSION_LOCAL_TIMEOUT = 10
+COUPON_CACHE_TIMEOUT = 60
+# Số mã tối đa giữ trong bộ nhớ mỗi process (đợt phát hàng trăm nghìn mã không làm phình bộ nhớ)
+COUPON_LOCAL_MAX_CODES = 1000
+
+_MISSING = 'missing'
+
+_local = {'version': None, 'codes': {}}
+
+
+def get_coupon_version():
+    return get_version(COUPON_VERSION_KEY, COUPON_VERSION_LOCAL_TIMEOUT)
+
+
+def bump_coupon_version():
+    bump_version(COUPON_VERSION_KEY)
+    _local['codes'] = {}
+
+
+def get_coupon_by_code(code):
+    """Coupon theo mã (không phân biệt hoa thường / khoảng trắng), None nếu không có."""
+    code = normalize_code(code)
+    if not code:
+        return None
+
+    version = get_coupon_version()
+    if _local['version'] != version:
+        _local['version'] = version
+        _local['codes'] = {}
+    codes = _local['codes']
+
+    local = codes.get(code)
+    if local is not None and local[1] > time.monotonic():
+        coupon = local[0]
+    else:
+        key = f'coupons:code:{version}:{code}'
+        coupon = cache.get(key)
+        if coupon is None:
+            # code = .. trên cột đã chuẩn hoá → đi theo unique index
+            coupon = Coupon.objects.filter(code=code).first()
+            if coupon is not None:
+                coupon.get_category_ids()
+            coupon = coupon if coupon is not None else _MISSING
+            cache.set(key, coupon, COUPON_CACHE_TIMEOUT)
+        if len(codes) >= COUPON_LOCAL_MAX_CODES:
+            codes.clear()
+        codes[code] = (coupon, time.monotonic() + COUPON_CACHE_TIMEOUT)
+    return None if coupon == _MISSING else coupon
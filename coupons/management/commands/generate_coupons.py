@@ -0,0 +1,84 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from category.models import Category
+from coupons.bulk import (
+    COUPON_BATCH_SIZE, MAX_PREFIX_LENGTH, create_coupon_batch, generate_codes, read_codes_csv, write_coupons_csv,
+)
+
+
+class Command(BaseCommand):
+    help = "Tạo mã giảm giá hàng loạt (sinh ngẫu nhiên hoặc nhập từ CSV) và xuất danh sách ra CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, help="Số mã cần sinh ngẫu nhiên.")
+        parser.add_argument('--from-csv', help="Nhập mã có sẵn từ cột đầu tiên của file CSV thay vì sinh ngẫu nhiên.")
+        parser.add_argument('--prefix', default='', help=f"Tiền tố của mã (tối đa {MAX_PREFIX_LENGTH} ký tự).")
+        parser.add_argument('--discount', type=int, required=True, help="Phần trăm giảm (1–70).")
+        parser.add_argument('--days', type=int, default=30, help="Số ngày hiệu lực kể từ bây giờ (mặc định 30).")
+        parser.add_argument('--max-discount', type=int, default=0, help="Số tiền giảm tối đa (0: không giới hạn).")
+        parser.add_argument('--min-purchase', type=int, default=0, help="Đơn tối thiểu (0: không yêu cầu).")
+        parser.add_argument('--max-usage', type=int, default=1, help="Số lượt dùng mỗi mã (mặc định 1).")
+        parser.add_argument('--max-usage-per-customer', type=int, default=1)
+        parser.add_argument('--category', action='append', default=[],
+                            help="Id hoặc slug ngành hàng áp dụng (lặp lại được). Bỏ trống: áp dụng toàn bộ.")
+        parser.add_argument('--inactive', action='store_true', help="Tạo mã ở trạng thái tắt.")
+        parser.add_argument('--description', default='')
+        parser.add_argument('--batch-size', type=int, default=COUPON_BATCH_SIZE)
+        parser.add_argument('--output', help="File CSV để ghi danh sách mã (mặc định: stdout).")
+
+    def _get_categories(self, values):
+        if not values:
+            return []
+        lookup = Q(slug__in=values) | Q(pk__in=[value for value in values if value.isdigit()])
+        categories = list(Category.objects.filter(lookup))
+        found = {str(category.pk) for category in categories} | {category.slug for category in categories}
+        missing = [value for value in values if value not in found]
+        if missing:
+            raise CommandError(f"Không tìm thấy ngành hàng: {', '.join(missing)}")
+        return categories
+
+    def handle(self, *args, **options):
+        if not 1 <= options['discount'] <= 70:
+            raise CommandError("Phần trăm giảm giá phải nằm trong khoảng 1% đến 70%.")
+        if bool(options['count']) == bool(options['from_csv']):
+            raise CommandError("Dùng 1 trong 2: --count hoặc --from-csv.")
+
+        categories = self._get_categories(options['category'])
+        now = timezone.now()
+        template = {
+            'description': options['description'],
+            'valid_from': now,
+            'valid_to': now + datetime.timedelta(days=options['days']),
+            'discount': options['discount'],
+            'active': not options['inactive'],
+            'max_discount_amount': options['max_discount'],
+            'max_usage_count': options['max_usage'],
+            'max_usage_per_customer': options['max_usage_per_customer'],
+            'min_purchase_amount': options['min_purchase'],
+            'applies_to': 'CATEGORY' if categories else 'ALL',
+        }
+
+        if options['from_csv']:
+            with open(options['from_csv'], newline='', encoding='utf-8') as fileobj:
+                codes = read_codes_csv(fileobj)
+        else:
+            try:
+                codes = generate_codes(options['count'], options['prefix'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        created, skipped = create_coupon_batch(codes, template, categories, options['batch_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fileobj:
+                write_coupons_csv(created, fileobj)
+        else:
+            write_coupons_csv(created, self.stdout)
+
+        if skipped:
+            self.stderr.write(self.style.WARNING(f"Bỏ qua {len(skipped)} mã đã tồn tại / quá dài."))
+        self.stderr.write(self.style.SUCCESS(f"Đã tạo {len(created)} mã giảm giá."))
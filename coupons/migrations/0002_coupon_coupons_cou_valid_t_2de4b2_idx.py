@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['valid_to', 'id'], name='coupons_cou_valid_t_2de4b2_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def sync_redeemed_count(apps, schema_editor):
+    # redeemed_count = số CouponUsage đã có của từng coupon
+    Coupon = apps.get_model('coupons', 'Coupon')
+    CouponUsage = apps.get_model('coupons', 'CouponUsage')
+    counts = CouponUsage.objects.filter(coupon=OuterRef('pk')).order_by().values('coupon').annotate(
+        total=Count('id')).values('total')
+    Coupon.objects.update(redeemed_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0002_coupon_coupons_cou_valid_t_2de4b2_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='redeemed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(sync_redeemed_count, migrations.RunPython.noop),
+    ]
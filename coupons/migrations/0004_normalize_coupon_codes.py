@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+def _renamed_code(code, taken, max_length):
+    # 'sale' trùng 'SALE' → 'SALE-2', 'SALE-3'... (cắt bớt phần đầu nếu vượt max_length)
+    n = 2
+    while True:
+        suffix = f'-{n}'
+        candidate = code[:max_length - len(suffix)] + suffix
+        if candidate not in taken:
+            return candidate
+        n += 1
+
+
+def normalize_codes(apps, schema_editor):
+    """
+    Đưa mã cũ về dạng chuẩn (bỏ khoảng trắng 2 đầu, chữ hoa) để tra cứu bằng code = .. theo unique index.
+    Mã trùng nhau khi bỏ phân biệt hoa thường ("sale" / "SALE"): mã đã ở dạng chuẩn (hoặc mã tạo trước)
+    giữ dạng chuẩn, các mã còn lại được đổi tên thêm hậu tố ("SALE-2"), kèm Order.coupon của các đơn
+    đã dùng mã đó. Danh sách mã bị đổi tên được in ra để báo lại cho khách / nhân viên.
+    """
+    Coupon = apps.get_model('coupons', 'Coupon')
+    Order = apps.get_model('orders', 'Order')
+    max_length = Coupon._meta.get_field('code').max_length
+
+    coupons = list(Coupon.objects.order_by('pk').only('pk', 'code'))
+    taken = {coupon.code for coupon in coupons if coupon.code == coupon.code.strip().upper()}
+    changed = []
+    renamed = []
+    for coupon in coupons:
+        code = coupon.code.strip().upper()
+        if code == coupon.code:
+            continue
+        if code in taken:
+            new_code = _renamed_code(code, taken, max_length)
+            renamed.append((coupon.pk, coupon.code, new_code))
+            code = new_code
+        taken.add(code)
+        coupon.code = code
+        changed.append(coupon)
+    Coupon.objects.bulk_update(changed, ['code'], batch_size=500)
+
+    for pk, old_code, new_code in renamed:
+        # Order.coupon lưu đúng mã lúc đặt hàng (coupon_obj.code); đơn cũ không có CouponUsage
+        # nên đổi theo mã, không theo CouponUsage
+        Order.objects.filter(coupon=old_code).update(coupon=new_code)
+
+    if changed:
+        print(f'\n  Chuẩn hoá {len(changed)} mã giảm giá, đổi tên {len(renamed)} mã trùng:')
+        for pk, old_code, new_code in renamed:
+            print(f'    coupon #{pk}: "{old_code}" -> "{new_code}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0003_coupon_redeemed_count'),
+        ('orders', '0005_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_codes, migrations.RunPython.noop),
+    ]
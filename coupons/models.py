@@ -1,5 +1,7 @@
 # coupons/models.py
 from django.db import models
+from django.db.models import Case, CharField, Count, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxValueValidator
 from category.models import Category
 from django.contrib.auth import get_user_model
@@ -7,6 +9,44 @@ from django.utils import timezone
 
 User = get_user_model()
 
+
+def normalize_code(code):
+   """Dạng chuẩn của mã giảm giá: bỏ khoảng trắng 2 đầu, chữ hoa (' giam20k ' -> 'GIAM20K')."""
+   return (code or "").strip().upper()
+
+
+class CouponQuerySet(models.QuerySet):
+   def with_status(self, now=None):
+       """
+       Thêm status ('expired' / 'upcoming' / 'inactive' / 'active') tính ngay trong SQL,
+       cùng thứ tự ưu tiên với Coupon.get_status(), để lọc và đếm theo trạng thái.
+       """
+       now = now or timezone.now()
+       return self.annotate(
+           status=Case(
+               When(valid_to__lt=now, then=Value("expired")),
+               When(valid_from__gt=now, then=Value("upcoming")),
+               When(active=False, then=Value("inactive")),
+               default=Value("active"),
+               output_field=CharField(),
+           ),
+       )
+
+   def with_usage(self):
+       """
+       Thêm used_total (tổng used_count của CouponUsage) và category_count cho trang quản lý.
+       Dùng subquery thay vì JOIN + GROUP BY: ORDER BY valid_to LIMIT .. vẫn đi theo index
+       và subquery chỉ chạy cho các coupon của trang đang xem.
+       """
+       usage = CouponUsage.objects.filter(coupon=OuterRef('pk')).order_by().values('coupon')
+       categories = Coupon.categories.through.objects.filter(coupon=OuterRef('pk')).order_by().values('coupon')
+       return self.annotate(
+           used_total=Coalesce(Subquery(usage.annotate(total=Sum('used_count')).values('total')), 0),
+           category_count=Coalesce(
+               Subquery(categories.annotate(total=Count('pk')).values('total'), output_field=IntegerField()), 0),
+       )
+
+
 class Coupon(models.Model):
    code = models.CharField(max_length=10, unique=True)
    description=models.TextField(blank=True)
@@ -31,6 +71,8 @@ class Coupon(models.Model):
        default=1,
        help_text="Số lần tối đa mỗi khách hàng (đã đăng nhập) được sử dụng mã."
    )
+   # Số lượt đã dùng (= số CouponUsage còn hiệu lực), do coupons/redemption.py cập nhật – không sửa tay
+   redeemed_count = models.PositiveIntegerField(default=0, editable=False)
    min_purchase_amount = models.PositiveIntegerField(
        default=0,
        help_text="Giá trị đơn hàng tối thiểu (trước giảm giá) để áp dụng mã (0: Không yêu cầu)."
@@ -54,14 +96,26 @@ class Coupon(models.Model):
    )
 
 
+   objects = CouponQuerySet.as_manager()
+
+
    class Meta:
        verbose_name = "Coupon Code"
+       indexes = [
+           models.Index(fields=['valid_to', 'id']),
+       ]
 
 
    def __str__(self):
        return self.code
 
 
+   def save(self, *args, **kwargs):
+       # Lưu mã ở dạng chuẩn → tra cứu bằng code = .. dùng được unique index (không cần iexact)
+       self.code = normalize_code(self.code)
+       super().save(*args, **kwargs)
+
+
 # ============= LOGIC TRẠNG THÁI =============
 
 
@@ -128,18 +182,32 @@ class Coupon(models.Model):
        return discount_by_percent
 
 
+   # --- Danh sách id ngành hàng được áp mã (None = áp dụng toàn bộ) ---
+   def get_category_ids(self):
+       if self.applies_to == 'ALL':
+           return None
+       # Query 1 lần rồi nhớ lại (coupon lấy từ cache mã nóng đã có sẵn category_ids)
+       if not hasattr(self, 'category_ids'):
+           self.category_ids = set(self.categories.values_list('pk', flat=True))
+       return self.category_ids
+
+
    # --- Kiểm tra 1 product có được áp mã không ---
-   def applies_to_product(self, product):
+   def applies_to_product(self, product, category_ids=None):
        if self.applies_to == 'ALL':
            return True
-       return self.categories.filter(pk=getattr(product.category, "pk", None)).exists()
+       if category_ids is None:
+           category_ids = self.get_category_ids()
+       return product.category_id in category_ids
 
 
    # --- Tính subtotal đủ điều kiện từ danh sách cart_items ---
    def eligible_subtotal(self, cart_items):
+       # Lấy category của coupon 1 lần cho cả giỏ hàng
+       category_ids = self.get_category_ids()
        subtotal = 0
        for ci in cart_items:
-           if self.applies_to_product(ci.product):
+           if self.applies_to_product(ci.product, category_ids):
                subtotal += ci.product.price * ci.quantity
        return subtotal
 
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import F, Q
+
+from .lookup import bump_coupon_version
+from .models import Coupon, CouponUsage, normalize_code
+from .wallet import bump_wallet_version
+
+
+# ============================================================
+# GHI NHẬN LƯỢT DÙNG COUPON KHI CHỐT ĐƠN
+# Coupon.redeemed_count là bộ đếm lượt đã dùng, tăng bằng 1 câu UPDATE có điều kiện
+# (redeemed_count < max_usage_count) trong transaction chốt đơn → 2 khách cùng lúc không thể
+# vượt giới hạn như khi đếm CouponUsage rồi mới ghi.
+# Đơn bị huỷ / hoàn kho → trả lại lượt (xoá CouponUsage, giảm bộ đếm).
+# ============================================================
+RELEASED_STATUSES = ('Cancelled', 'Returned To Warehouse')
+
+
+class CouponRedemptionError(Exception):
+    """Coupon của đơn không còn lượt (toàn hệ thống hoặc của khách) tại thời điểm chốt đơn."""
+
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+        super().__init__(reason)
+
+
+def _get_order_coupon(order):
+    if not order.coupon:
+        return None
+    return Coupon.objects.filter(code=normalize_code(order.coupon)).first()
+
+
+def redeem_coupon(order, enforce_limits=True):
+    """
+    Giữ 1 lượt coupon cho đơn, gọi bên trong transaction chốt đơn (finalize_order):
+    1. UPDATE coupon SET redeemed_count = redeemed_count + 1
+       WHERE id = .. AND (max_usage_count = 0 OR redeemed_count < max_usage_count)
+       0 dòng → hết lượt. Câu UPDATE giữ khoá dòng coupon tới hết transaction,
+       nên các đơn dùng cùng mã xếp hàng tại đây.
+    2. Đang giữ khoá → đếm lượt của khách, rồi tạo CouponUsage cho đơn (lượt của khách).
+    Lỗi thì raise CouponRedemptionError, savepoint rollback phần đã tăng.
+    Trả về coupon đã dùng (None nếu đơn không có coupon, hoặc mã đã bị xoá khi enforce_limits=False).
+    """
+    if not order.coupon:
+        return None
+    coupon = _get_order_coupon(order)
+    if coupon is None:
+        if not enforce_limits:
+            # Mở lại đơn cũ mà mã đã bị xoá → không còn bộ đếm nào để giữ lượt, bỏ qua
+            return None
+        raise CouponRedemptionError("not_found", f"Mã “{order.coupon}” không còn tồn tại.")
+
+    with transaction.atomic():
+        claimed = Coupon.objects.filter(pk=coupon.pk)
+        if enforce_limits:
+            claimed = claimed.filter(Q(max_usage_count=0) | Q(redeemed_count__lt=F('max_usage_count')))
+        if not claimed.update(redeemed_count=F('redeemed_count') + 1):
+            # Cache mã nóng có thể vẫn thấy mã còn lượt → làm mới để apply_coupon báo hết lượt
+            bump_coupon_version()
+            raise CouponRedemptionError("usage_limit", f"Mã “{coupon.code}” đã hết lượt sử dụng.")
+
+        if enforce_limits and coupon.max_usage_per_customer > 0:
+            used = CouponUsage.objects.filter(coupon=coupon, user=order.user).count()
+            if used >= coupon.max_usage_per_customer:
+                raise CouponRedemptionError(
+                    "customer_limit", f"Bạn đã dùng hết số lần cho phép của mã “{coupon.code}”.")
+
+        CouponUsage.objects.create(coupon=coupon, user=order.user, order_id=order.order_number, used_count=1)
+
+        if coupon.max_usage_count and not Coupon.objects.filter(
+                pk=coupon.pk, redeemed_count__lt=F('max_usage_count')).exists():
+            # Lượt cuối của mã → mã biến mất khỏi ví của mọi user
+            bump_wallet_version()
+
+    return coupon
+
+
+def release_coupon(order):
+    """Trả lại lượt coupon của đơn: xoá CouponUsage của đơn và giảm redeemed_count tương ứng."""
+    coupon = _get_order_coupon(order)
+    if coupon is None:
+        return 0
+
+    with transaction.atomic():
+        released, _ = CouponUsage.objects.filter(coupon=coupon, order_id=order.order_number).delete()
+        if released:
+            Coupon.objects.filter(pk=coupon.pk, redeemed_count__gte=released).update(
+                redeemed_count=F('redeemed_count') - released)
+            bump_coupon_version()
+            if coupon.max_usage_count:
+                # Mã có thể vừa hết lượt trước đó → hiện lại trong ví của mọi user
+                bump_wallet_version()
+    return released
+
+
+def update_order_coupon(order, old_status):
+    """
+    Gọi sau khi đổi order.status, trong cùng transaction với order.save() và update_order_status():
+    huỷ / hoàn kho → trả lượt; mở lại đơn → giữ lại lượt (không chặn giới hạn, mã đã bị xoá thì bỏ qua).
+    """
+    if not order.coupon or not order.is_ordered or order.user_id is None:
+        return
+    was_redeemed = old_status not in RELEASED_STATUSES
+    now_redeemed = order.status not in RELEASED_STATUSES
+    if was_redeemed and not now_redeemed:
+        release_coupon(order)
+    elif now_redeemed and not was_redeemed:
+        redeem_coupon(order, enforce_limits=False)
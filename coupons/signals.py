@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Coupon, CouponUsage
+from .lookup import bump_coupon_version
+from .wallet import bump_wallet_version
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupon_changed(sender, **kwargs):
+    bump_wallet_version()
+
+
+@receiver(post_save, sender=CouponUsage)
+@receiver(post_delete, sender=CouponUsage)
+def coupon_usage_changed(sender, instance, **kwargs):
+    # Lượt dùng chỉ đổi ví của user đó (mã hết lượt toàn hệ thống: xem coupons/redemption.py)
+    bump_wallet_version(instance.user_id)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+@receiver(m2m_changed, sender=Coupon.categories.through)
+def coupon_code_changed(sender, **kwargs):
+    bump_coupon_version()
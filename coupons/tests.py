@@ -1,3 +1,252 @@
-from django.test import TestCase
+import csv
+import datetime
+import functools
+import io
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account
+from category.models import Category
+from dkmv.testing import run_concurrently
+from management.models import DailySalesRollup
+from orders.models import Order
+from .bulk import create_coupon_batch, generate_codes
+from .forms import COUPON_BATCH_MAX_COUNT, CouponBatchForm
+from .lookup import get_coupon_by_code
+from .models import Coupon, CouponUsage
+from .redemption import CouponRedemptionError, redeem_coupon, release_coupon
+from .wallet import get_coupon_wallet, get_wallet_version
+
+
+def create_customer(username):
+    # Không đặt mật khẩu (không cần đăng nhập) → không tốn thời gian hash khi tạo nhiều khách
+    user = Account.objects.create_user('An', 'Nguyen', username, f'{username}@example.com')
+    user.is_active = True
+    user.save()
+    return user
+
+
+def create_coupon(code, **fields):
+    now = timezone.now()
+    return Coupon.objects.create(
+        code=code, discount=10, active=True,
+        valid_from=now - datetime.timedelta(days=1), valid_to=now + datetime.timedelta(days=5), **fields)
+
+
+def create_order(user, coupon_code, number):
+    return Order.objects.create(
+        user=user, order_number=number, first_name='An', last_name='Nguyen', phone='0900000000',
+        email=user.email, address_line_1='1 Le Loi', country='VN', city='HCM', order_total=100, VAT=2,
+        coupon=coupon_code, is_ordered=True,
+    )
+
+
+class CouponWalletCacheTests(TestCase):
+    """Ví "Coupon của tôi" được cache theo version chung + version của từng user (coupons/wallet.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.an = create_customer('an')
+        cls.binh = create_customer('binh')
+
+    def test_usage_only_refreshes_that_users_wallet(self):
+        coupon = create_coupon('SAVE10')
+        versions = (get_wallet_version(), get_wallet_version(self.an.pk), get_wallet_version(self.binh.pk))
+
+        CouponUsage.objects.create(coupon=coupon, user=self.an, order_id='A1', used_count=1)
+
+        self.assertEqual(get_wallet_version(), versions[0])
+        self.assertNotEqual(get_wallet_version(self.an.pk), versions[1])
+        self.assertEqual(get_wallet_version(self.binh.pk), versions[2])
+
+    def test_per_customer_limit_hides_coupon_for_that_user_only(self):
+        coupon = create_coupon('ONCE', max_usage_per_customer=1)
+        self.assertEqual(get_coupon_wallet(self.an), [coupon])
+        self.assertEqual(get_coupon_wallet(self.binh), [coupon])
+
+        redeem_coupon(create_order(self.an, 'ONCE', 'A1'))
+
+        self.assertEqual(get_coupon_wallet(self.an), [])
+        self.assertEqual(get_coupon_wallet(self.binh), [coupon])
+
+    def test_last_redemption_hides_coupon_from_every_wallet(self):
+        coupon = create_coupon('LAST', max_usage_count=1)
+        self.assertEqual(get_coupon_wallet(self.binh), [coupon])
+
+        order = create_order(self.an, 'LAST', 'A1')
+        redeem_coupon(order)
+        self.assertEqual(get_coupon_wallet(self.binh), [])
+
+        release_coupon(order)
+        self.assertEqual(get_coupon_wallet(self.binh), [coupon])
+
+
+class OrderStatusCouponTests(TestCase):
+    """Staff đổi trạng thái đơn (order_detail): trạng thái, doanh số và lượt coupon đổi trong 1 transaction."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_customer('staff')
+        cls.staff.role = 'staff'
+        cls.staff.save()
+        cls.order = create_order(create_customer('an'), 'GONE', 'C1')
+        Order.objects.filter(pk=cls.order.pk).update(status='Cancelled')
+
+    def _reopen(self):
+        self.client.force_login(self.staff)
+        return self.client.post(reverse('order_detail', args=[self.order.order_number]), {'status': 'Pending'})
+
+    def test_reopening_order_of_deleted_coupon(self):
+        response = self._reopen()
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'Pending')
+        self.assertEqual(DailySalesRollup.objects.get().order_count, 1)
+
+    def test_coupon_error_rolls_back_status_and_rollup(self):
+        error = CouponRedemptionError('not_found', 'x')
+        with mock.patch('accounts.views.update_order_coupon', side_effect=error), \
+                self.assertRaises(CouponRedemptionError):
+            self._reopen()
+
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'Cancelled')
+        self.assertFalse(DailySalesRollup.objects.filter(order_count__gt=0).exists())
+
+
+class CouponLookupCacheTests(TestCase):
+    """Tra cứu mã (coupons/lookup.py): mã nóng đọc từ bộ nhớ process, mã đổi thì đọc lại."""
+
+    def test_warm_lookup_makes_no_queries(self):
+        create_coupon('SAVE10')
+        get_coupon_by_code('save10')
+        get_coupon_by_code('NOPE')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_coupon_by_code(' save10 ').code, 'SAVE10')
+            self.assertIsNone(get_coupon_by_code('nope'))
+        self.assertEqual(len(queries), 0)
+
+    def test_updated_coupon_is_read_again(self):
+        coupon = create_coupon('SAVE10')
+        get_coupon_by_code('SAVE10')
+        coupon.discount = 25
+        coupon.save()
+
+        self.assertEqual(get_coupon_by_code('SAVE10').discount, 25)
+
+
+class CouponBatchTests(TestCase):
+    """Tạo mã hàng loạt (coupons/bulk.py): coupon và bảng trung gian ngành hàng đều ghi theo batch."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [
+            Category.objects.create(category_name='Áo', slug='ao'),
+            Category.objects.create(category_name='Quần', slug='quan'),
+        ]
+
+    def test_batch_writes_in_batches_not_per_code(self):
+        now = timezone.now()
+        codes = generate_codes(3000, 'TET')
+        template = {'discount': 15, 'valid_from': now, 'valid_to': now, 'max_usage_count': 1,
+                    'applies_to': 'CATEGORY'}
+
+        with CaptureQueriesContext(connection) as queries:
+            created, skipped = create_coupon_batch(codes, template, self.categories)
+
+        self.assertEqual((len(created), skipped), (3000, []))
+        self.assertEqual(Coupon.categories.through.objects.count(), 6000)
+        # create() + categories.set() từng mã tốn >= 3 query mỗi mã
+        self.assertLess(len(queries), len(codes) // 20)
+
+    def test_existing_codes_are_skipped(self):
+        create_coupon('TET0001')
+        created, skipped = create_coupon_batch(['tet0001', 'TET0002'], {
+            'discount': 15, 'valid_from': timezone.now(), 'valid_to': timezone.now()})
+        self.assertEqual(([coupon.code for coupon in created], skipped), (['TET0002'], ['TET0001']))
+
+    def test_only_candidate_codes_are_checked(self):
+        create_coupon('OLD0001')
+        with CaptureQueriesContext(connection) as queries:
+            codes = generate_codes(2000, 'TET')
+            create_coupon_batch(codes, {'discount': 15, 'valid_from': timezone.now(), 'valid_to': timezone.now()})
+
+        selects = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('SELECT') and 'FROM "coupons_coupon"' in query['sql']]
+        self.assertTrue(selects)
+        self.assertTrue(all('"code" IN (' in sql for sql in selects), selects)
+
+    def test_code_created_concurrently_is_skipped(self):
+        create_coupon('TET0001')
+        # Lượt kiểm tra đầu không thấy TET0001 (được tạo ngay sau đó) → bulk_create gặp IntegrityError
+        with mock.patch('coupons.bulk._existing_codes', side_effect=[set(), {'TET0001'}]):
+            created, skipped = create_coupon_batch(['TET0001', 'TET0002'], {
+                'discount': 15, 'valid_from': timezone.now(), 'valid_to': timezone.now()})
+        self.assertEqual(([coupon.code for coupon in created], skipped), (['TET0002'], ['TET0001']))
+
+    def test_web_form_sends_large_batches_to_the_command(self):
+        form = CouponBatchForm({'count': COUPON_BATCH_MAX_COUNT + 1})
+        self.assertFalse(form.is_valid())
+        self.assertIn('generate_coupons', form.errors['count'][0])
+
+    def test_generate_coupons_command_writes_csv(self):
+        out = io.StringIO()
+        call_command('generate_coupons', count=50, prefix='sale', discount=20, category=['ao'],
+                     stdout=out, stderr=io.StringIO())
+
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 50)
+        self.assertTrue(all(row['code'].startswith('SALE') for row in rows))
+        coupon = Coupon.objects.get(code=rows[0]['code'])
+        self.assertEqual(list(coupon.categories.all()), self.categories[:1])
+
+
+class CouponRedemptionStressTests(TransactionTestCase):
+    """
+    Nhiều khách chốt đơn cùng 1 mã cùng lúc (mỗi thread 1 connection DB): redeem_coupon tăng
+    redeemed_count bằng UPDATE có điều kiện nên không bao giờ vượt max_usage_count.
+    """
+
+    SHOPPERS = 40
+
+    def _redeem_concurrently(self, orders):
+        def redeem(order):
+            try:
+                redeem_coupon(order)
+                return 'ok'
+            except CouponRedemptionError as e:
+                return e.status
+
+        return Counter(run_concurrently([functools.partial(redeem, order) for order in orders]))
+
+    def test_usage_cap_is_never_exceeded(self):
+        coupon = create_coupon('FLASH', max_usage_count=10, max_usage_per_customer=1)
+        orders = [
+            create_order(create_customer(f'shopper{i}'), 'FLASH', f'F{i}') for i in range(self.SHOPPERS)
+        ]
+
+        results = self._redeem_concurrently(orders)
+
+        coupon.refresh_from_db()
+        self.assertEqual(results, Counter({'ok': 10, 'usage_limit': self.SHOPPERS - 10}))
+        self.assertEqual(coupon.redeemed_count, 10)
+        self.assertEqual(CouponUsage.objects.filter(coupon=coupon).count(), 10)
+
+    def test_per_customer_limit_holds_for_parallel_orders(self):
+        coupon = create_coupon('ONCE', max_usage_count=0, max_usage_per_customer=1)
+        user = create_customer('an')
+        orders = [create_order(user, 'ONCE', f'A{i}') for i in range(10)]
+
+        results = self._redeem_concurrently(orders)
+
+        coupon.refresh_from_db()
+        self.assertEqual(results, Counter({'ok': 1, 'customer_limit': 9}))
+        self.assertEqual(coupon.redeemed_count, 1)
+        self.assertEqual(CouponUsage.objects.filter(coupon=coupon, user=user).count(), 1)
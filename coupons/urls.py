@@ -11,6 +11,7 @@ urlpatterns = [
 
     path('', views.coupon_list, name='coupon_list'),
     path('create/', views.coupon_create, name='coupon_create'),
+    path('generate/', views.coupon_generate, name='coupon_generate'),
     path('/<int:pk>/edit/', views.coupon_update, name='coupon_update'),
     path('/<int:pk>/delete/', views.coupon_delete, name='coupon_delete'),
     path("/<int:pk>/", views.coupon_detail, name="coupon_detail"),  # 👈 NEW
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+
+from django.contrib import messages
+
+from .lookup import get_coupon_by_code
+from .models import Coupon, CouponUsage
+
+
+# Kết quả kiểm tra coupon: status + lý do hiển thị cho khách + mức message tương ứng
+OK = "ok"
+STATUS_LEVELS = {
+    OK: messages.SUCCESS,
+    "not_found": messages.ERROR,
+    "expired": messages.ERROR,
+    "inactive": messages.ERROR,
+    "upcoming": messages.WARNING,
+    "not_applicable": messages.WARNING,
+    "min_purchase": messages.WARNING,
+    "customer_limit": messages.WARNING,
+    "usage_limit": messages.WARNING,
+}
+
+
+@dataclass(frozen=True)
+class CouponCheck:
+    status: str
+    coupon: Coupon = None
+    eligible_subtotal: float = 0
+    discount: float = 0
+    reason: str = ""
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    @property
+    def level(self):
+        return STATUS_LEVELS[self.status]
+
+
+class CouponValidator:
+    """
+    Kiểm tra 1 coupon cho 1 giỏ hàng, dùng chung cho apply_coupon, cart, checkout và place_order:
+    - trạng thái (hết hạn / chưa bắt đầu / đang tắt)
+    - phạm vi ngành hàng + đơn tối thiểu (1 query lấy category id của coupon)
+    - giới hạn toàn hệ thống (bộ đếm redeemed_count) + mỗi khách (1 câu COUNT)
+    cart_items phải có sẵn product (select_related) để không query thêm.
+    """
+
+    def __init__(self, coupon, user=None):
+        self.coupon = coupon
+        self.user = user if user is not None and user.is_authenticated else None
+
+    @classmethod
+    def for_code(cls, code, user=None):
+        coupon = get_coupon_by_code(code)
+        return cls(coupon, user)
+
+    def usage_counts(self):
+        """
+        (số lần toàn hệ thống, số lần của user hiện tại).
+        Toàn hệ thống đọc từ bộ đếm Coupon.redeemed_count (coupons/redemption.py), không COUNT CouponUsage;
+        chỉ đếm CouponUsage của user khi mã có giới hạn mỗi khách.
+        """
+        coupon = self.coupon
+        mine = 0
+        if coupon.max_usage_per_customer > 0 and self.user is not None:
+            mine = CouponUsage.objects.filter(coupon=coupon, user=self.user).count()
+        return coupon.redeemed_count, mine
+
+    def _fail(self, status, reason, eligible_subtotal=0):
+        return CouponCheck(status=status, coupon=self.coupon, eligible_subtotal=eligible_subtotal, reason=reason)
+
+    def validate(self, cart_items):
+        coupon = self.coupon
+        if coupon is None:
+            return CouponCheck(status="not_found", reason="Mã giảm giá không tồn tại.")
+
+        status = coupon.get_status()
+        if status == "expired":
+            return self._fail(status, f"Mã “{coupon.code}” đã hết hạn sử dụng.")
+        if status == "upcoming":
+            return self._fail(status, f"Mã “{coupon.code}” chưa đến thời gian áp dụng.")
+        if status == "inactive":
+            return self._fail(status, f"Mã “{coupon.code}” hiện đang tắt, không thể áp dụng.")
+
+        eligible_subtotal = coupon.eligible_subtotal(cart_items)
+        if eligible_subtotal <= 0:
+            return self._fail("not_applicable", f"Mã “{coupon.code}” không áp dụng cho sản phẩm trong giỏ.")
+
+        if coupon.min_purchase_amount > 0 and eligible_subtotal < coupon.min_purchase_amount:
+            return self._fail(
+                "min_purchase",
+                f"Đơn hàng cần đạt tối thiểu {coupon.min_purchase_amount:,.0f}đ cho sản phẩm được áp mã.",
+                eligible_subtotal,
+            )
+
+        total_used, user_used = self.usage_counts()
+        if self.user is not None and 0 < coupon.max_usage_per_customer <= user_used:
+            return self._fail(
+                "customer_limit", f"Bạn đã dùng hết số lần cho phép của mã “{coupon.code}”.", eligible_subtotal)
+        if 0 < coupon.max_usage_count <= total_used:
+            return self._fail("usage_limit", f"Mã “{coupon.code}” đã đạt giới hạn số lần sử dụng.", eligible_subtotal)
+
+        return CouponCheck(
+            status=OK,
+            coupon=coupon,
+            eligible_subtotal=eligible_subtotal,
+            discount=round(coupon.get_discount_value(eligible_subtotal), 2),
+            reason=f"Áp dụng mã “{coupon.code}” thành công: giảm {coupon.discount}%",
+        )
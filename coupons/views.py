@@ -1,17 +1,22 @@
 # coupons/views.py
+from django.http import HttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Sum
+from django.core.paginator import Paginator
+from django.db.models import Count, Q, Sum
 
 
 from .models import Coupon, CouponUsage
-from .forms import CouponCodeForm
+from .forms import CouponCodeForm, CouponBatchForm
+from .bulk import create_coupon_batch, generate_codes, write_coupons_csv
 from carts.models import CartItem, Cart
-from carts.views import _cart_id
+from carts.views import _session_cart
 from coupons.admin import CouponAdminForm
+from .validation import CouponValidator
+from .wallet import get_coupon_wallet
 
 
 # Lấy cart theo user hoặc session
@@ -22,7 +27,9 @@ def _get_cart_items(request):
        ).select_related("product", "product__category")
 
 
-   cart = Cart.objects.get(cart_id=_cart_id(request))
+   cart = _session_cart(request)
+   if cart is None:
+       return CartItem.objects.none()
    return CartItem.objects.filter(
        cart=cart, is_active=True
    ).select_related("product", "product__category")
@@ -44,113 +51,26 @@ def apply_coupon(request):
 
    # ✅ Lấy đúng string code
    code = form.cleaned_data.get("code", "").strip()
-   now = timezone.now()
 
+   # Kiểm tra trạng thái, phạm vi ngành hàng, đơn tối thiểu, giới hạn số lần dùng
+   validator = CouponValidator.for_code(code, request.user)
+   check = validator.validate(list(_get_cart_items(request)))
 
-   # 1. Tìm coupon
-   try:
-       coupon = Coupon.objects.get(code__iexact=code)
-   except Coupon.DoesNotExist:
+   if check.status == "not_found":
        request.session.pop("coupon_id", None)
        request.session.pop("coupon_percent", None)
        messages.error(request, f"Mã “{code}” không tồn tại.")
        return redirect("cart")
 
-
-   status = coupon.get_status()
-
-
-   if status == "expired":
-       messages.error(request, f"Mã “{coupon.code}” đã hết hạn sử dụng.")
-       return redirect("cart")
-
-
-   if status == "upcoming":
-       messages.warning(request, f"Mã “{coupon.code}” chưa đến thời gian áp dụng.")
-       return redirect("cart")
-
-
-   if status == "inactive":
-       messages.error(request, f"Mã “{coupon.code}” hiện đang tắt, không thể áp dụng.")
-       return redirect("cart")
-
-
-   # 4. Cart items & phạm vi áp dụng
-   cart_items = _get_cart_items(request)
-   eligible_subtotal = coupon.eligible_subtotal(cart_items)
-
-
-   if eligible_subtotal <= 0:
-       messages.warning(
-           request,
-           f"Mã “{coupon.code}” không áp dụng cho sản phẩm trong giỏ."
-       )
+   if not check.ok:
+       messages.add_message(request, check.level, check.reason)
        return redirect("cart")
 
-
-   # 5. Đơn tối thiểu
-   if coupon.min_purchase_amount > 0 and eligible_subtotal < coupon.min_purchase_amount:
-       messages.warning(
-           request,
-           f"Đơn hàng cần đạt tối thiểu {coupon.min_purchase_amount:,.0f}đ "
-           "cho sản phẩm được áp mã."
-       )
-       return redirect("cart")
-
-
-   # 6. Giới hạn số lần sử dụng (toàn hệ thống + mỗi khách)
-   if request.user.is_authenticated:
-       user = request.user
-
-
-       # 6.1. Giới hạn mỗi khách
-       if coupon.max_usage_per_customer > 0:
-           user_used = CouponUsage.objects.filter(
-               coupon=coupon,
-               user=user,
-           ).count()
-           if user_used >= coupon.max_usage_per_customer:
-               messages.warning(
-                   request,
-                   f"Bạn đã dùng hết số lần cho phép của mã “{coupon.code}”."
-               )
-               return redirect("cart")
-
-
-       # 6.2. Giới hạn tổng số lần trên toàn hệ thống
-       if coupon.max_usage_count > 0:
-           total_used = CouponUsage.objects.filter(
-               coupon=coupon
-           ).count()
-           if total_used >= coupon.max_usage_count:
-               messages.warning(
-                   request,
-                   f"Mã “{coupon.code}” đã đạt giới hạn số lần sử dụng."
-               )
-               return redirect("cart")
-   else:
-       # Khách chưa đăng nhập: chỉ kiểm tra giới hạn tổng (nếu muốn)
-       if coupon.max_usage_count > 0:
-           total_used = CouponUsage.objects.filter(
-               coupon=coupon
-           ).count()
-           if total_used >= coupon.max_usage_count:
-               messages.warning(
-                   request,
-                   f"Mã “{coupon.code}” đã đạt giới hạn số lần sử dụng."
-               )
-               return redirect("cart")
-
-
    # --> Nếu tất cả OK → lưu vào session
-   request.session["coupon_id"] = coupon.id
-   request.session["coupon_percent"] = coupon.discount
+   request.session["coupon_id"] = check.coupon.id
+   request.session["coupon_percent"] = check.coupon.discount
 
-
-   messages.success(
-       request,
-       f"Áp dụng mã “{coupon.code}” thành công: giảm {coupon.discount}%"
-   )
+   messages.success(request, check.reason)
    return redirect("cart")
 
 
@@ -169,82 +89,45 @@ def remove_coupon(request):
 # TRANG "COUPON CỦA TÔI"
 @login_required(login_url='login')
 def my_coupons_view(request):
-   user = request.user
-
-
-   # Lấy tất cả coupon, để model tự quyết định trạng thái (active / upcoming / expired / inactive)
-   all_coupons = Coupon.objects.all().order_by('-valid_to')
-
-
-   visible_coupons = []
-
-
-   for coupon in all_coupons:
-       status = coupon.get_status()  # 'active', 'upcoming', 'expired', 'inactive'
-
-
-       # ❌ Bỏ qua những mã đã hết hạn hoặc đang tắt
-       if status in ("expired", "inactive"):
-           continue
-
-
-       # ✅ Giữ lại cả "active" và "upcoming"
-       # Kiểm tra giới hạn tổng số lần sử dụng (toàn hệ thống)
-       if coupon.max_usage_count > 0:
-           total_used = CouponUsage.objects.filter(coupon=coupon).count()
-           if total_used >= coupon.max_usage_count:
-               continue  # đã dùng hết lượt phát hành
-
-
-       # Kiểm tra giới hạn theo từng khách hàng
-       if coupon.max_usage_per_customer > 0:
-           user_used = CouponUsage.objects.filter(
-               coupon=coupon,
-               user=user,
-           ).count()
-           if user_used >= coupon.max_usage_per_customer:
-               continue  # user này đã dùng hết lượt cho mã này
-
-
-       visible_coupons.append(coupon)
-
-
-   visible_coupons.sort(key=lambda c: c.valid_to)
-
-
+   # Mã còn hạn / sắp bắt đầu và user còn lượt dùng – 1 query, có cache theo user (coupons/wallet.py)
    context = {
-       "coupons": visible_coupons,
+       "coupons": get_coupon_wallet(request.user),
    }
    return render(request, "accounts/my_coupons.html", context)
 
+COUPONS_PER_PAGE = 20
+
 @staff_member_required
 def coupon_list(request):
-    now = timezone.now()
-    coupons = Coupon.objects.all().order_by('-valid_to')
+   now = timezone.now()
+   status_filter = request.GET.get('status', 'all')
+
+   # Số liệu dashboard: 1 câu aggregate đếm theo trạng thái + 1 câu tổng lượt dùng
+   stats = Coupon.objects.with_status(now).aggregate(
+       total_coupons=Count('id'),
+       active_coupons=Count('id', filter=Q(status='active')),
+       expired_coupons=Count('id', filter=Q(status='expired')),
+       upcoming_coupons=Count('id', filter=Q(status='upcoming')),
+   )
+   total_usage = CouponUsage.objects.aggregate(total=Sum("used_count"))["total"] or 0
 
-    # Dashboard numbers
-    total_coupons = coupons.count()
-    active_coupons = coupons.filter(active=True, valid_from__lte=now, valid_to__gte=now).count()
-    expired_coupons = coupons.filter(valid_to__lt=now).count()
-    upcoming_coupons = coupons.filter(valid_from__gt=now).count()
-    total_usage = CouponUsage.objects.aggregate(total=Sum("used_count"))["total"] or 0
+   # Danh sách: used_total + category_count tính sẵn trong câu query, phân trang
+   coupons = Coupon.objects.with_status(now).with_usage().order_by('-valid_to', '-id')
+   if status_filter != 'all':
+       coupons = coupons.filter(status=status_filter)
 
-    # THÊM PHẦN NÀY — Thống kê usage cho từng coupon
-    for c in coupons:
-        c.used_total = CouponUsage.objects.filter(coupon=c).aggregate(
-            used=Sum("used_count")
-        )["used"] or 0
+   paginator = Paginator(coupons, COUPONS_PER_PAGE)
+   page_obj = paginator.get_page(request.GET.get('page'))
 
-    context = {
-        "now": now,
-        "coupons": coupons,
-        "total_coupons": total_coupons,
-        "active_coupons": active_coupons,
-        "expired_coupons": expired_coupons,
-        "upcoming_coupons": upcoming_coupons,
-        "total_usage": total_usage,
-    }
-    return render(request, 'coupons/coupon_list.html', context)
+   context = {
+       "now": now,
+       "coupons": page_obj,
+       "page_obj": page_obj,
+       "status_filter": status_filter,
+       "total_usage": total_usage,
+       **stats,
+   }
+   return render(request, 'coupons/coupon_list.html', context)
 
 @staff_member_required
 def coupon_create(request):
@@ -264,6 +147,33 @@ def coupon_create(request):
     context = {'form': form, 'title': 'Tạo Mã Giảm Giá Mới'}
     return render(request, 'coupons/coupon_form.html', context)
 
+@staff_member_required
+def coupon_generate(request):
+    """Tạo mã hàng loạt theo 1 mẫu coupon, trả về file CSV danh sách mã vừa tạo"""
+    if request.method == 'POST':
+        form = CouponBatchForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            template = {name: value for name, value in data.items() if name not in ('categories', 'count', 'prefix')}
+            categories = data['categories'] if data['applies_to'] == 'CATEGORY' else []
+
+            codes = generate_codes(data['count'], data['prefix'])
+            created, _ = create_coupon_batch(codes, template, categories)
+            messages.success(request, f'Đã tạo {len(created)} mã giảm giá.')
+
+            response = HttpResponse(content_type='text/csv')
+            filename = f"coupons-{data['prefix'] or 'batch'}-{timezone.localdate():%Y%m%d}.csv"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            write_coupons_csv(created, response)
+            return response
+        else:
+            messages.error(request, 'Đã có lỗi xảy ra. Vui lòng kiểm tra lại dữ liệu.')
+    else:
+        form = CouponBatchForm()
+
+    context = {'form': form, 'title': 'Tạo Mã Giảm Giá Hàng Loạt'}
+    return render(request, 'coupons/coupon_batch_form.html', context)
+
 @staff_member_required
 def coupon_update(request, pk):
     """Cập nhật Coupon đã tồn tại"""
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from dkmv.cache import bump_version, get_version
+from .models import Coupon
+
+
+# "Coupon của tôi": lọc hết hạn / đang tắt / hết lượt (bộ đếm redeemed_count) và đếm lượt của user
+# trong 1 query, kết quả cache theo user. Key gắn với 2 version (coupons/signals.py):
+#   - version chung: tăng khi Coupon thay đổi, hoặc khi 1 mã có giới hạn vừa hết lượt / được trả lượt
+#     (coupons/redemption.py) → ví của mọi user tự hết hiệu lực
+#   - version của user: tăng khi CouponUsage của user đó thay đổi → chỉ ví của user đó bị làm mới
+WALLET_VERSION_KEY = 'coupons:wallet:version'
+WALLET_CACHE_TIMEOUT = 60 * 5
+
+
+def _user_version_key(user_id):
+    return f'coupons:wallet:version:{user_id}'
+
+
+def get_wallet_version(user_id=None):
+    return get_version(WALLET_VERSION_KEY if user_id is None else _user_version_key(user_id))
+
+
+def bump_wallet_version(user_id=None):
+    """Không có user_id: làm mới ví của mọi user; có user_id: chỉ ví của user đó."""
+    bump_version(WALLET_VERSION_KEY if user_id is None else _user_version_key(user_id))
+
+
+def wallet_queryset(user, now=None):
+    """
+    Coupon còn dùng được cho user, sắp theo ngày hết hạn:
+    - chưa hết hạn, và đang bật hoặc chưa tới ngày bắt đầu (giống get_status() không phải expired / inactive)
+    - chưa hết lượt toàn hệ thống (max_usage_count) và lượt của user (max_usage_per_customer)
+    """
+    now = now or timezone.now()
+    return Coupon.objects.filter(
+        Q(active=True) | Q(valid_from__gt=now),
+        valid_to__gte=now,
+    ).annotate(
+        user_used=Count('usage_records', filter=Q(usage_records__user=user)),
+    ).filter(
+        Q(max_usage_count=0) | Q(redeemed_count__lt=F('max_usage_count')),
+        Q(max_usage_per_customer=0) | Q(user_used__lt=F('max_usage_per_customer')),
+    ).order_by('valid_to')
+
+
+def get_coupon_wallet(user):
+    key = f'coupons:wallet:{get_wallet_version()}:{get_wallet_version(user.pk)}:{user.pk}'
+    coupons = cache.get(key)
+    if coupons is None:
+        coupons = list(wallet_queryset(user))
+        cache.set(key, coupons, WALLET_CACHE_TIMEOUT)
+
+    # Cache có thể cũ tới WALLET_CACHE_TIMEOUT → bỏ các mã vừa hết hạn / vừa tới hạn mà đang tắt
+    return [coupon for coupon in coupons if coupon.get_status() not in ("expired", "inactive")]
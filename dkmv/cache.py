@@ -0,0 +1,44 @@
+import time
+
+from django.core.cache import cache
+
+
+# Cache theo version, dùng chung cho menu danh mục, tổng số sản phẩm, tra cứu coupon và ví coupon:
+# dữ liệu được cache dưới key có gắn version hiện tại; dữ liệu đổi thì bump_version(key)
+# → mọi key cũ tự hết hiệu lực mà không cần biết đã cache những key nào.
+# Version nằm trong cache dùng chung (settings.CACHES) nên có hiệu lực với mọi process.
+# get_version(key, local_timeout=n): process nhớ version vừa đọc và tin nó trong n giây mà không hỏi lại
+# cache dùng chung (cache mặc định là bảng DB → mỗi lần hỏi là 1 query). Process tự bump thì thấy ngay,
+# process khác thấy version mới chậm nhất n giây.
+
+_local_versions = {}
+
+
+def _new_version():
+    # Dùng thời điểm hiện tại để version mới không trùng với version process khác còn giữ
+    return int(time.time() * 1000)
+
+
+def get_version(key, local_timeout=0):
+    if local_timeout:
+        local = _local_versions.get(key)
+        if local is not None and local[1] > time.monotonic():
+            return local[0]
+
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+
+    if local_timeout:
+        _local_versions[key] = (version, time.monotonic() + local_timeout)
+    return version
+
+
+def bump_version(key):
+    _local_versions.pop(key, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key chưa có (cache mới khởi động / bị xoá)
+        cache.set(key, _new_version(), timeout=None)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -89,6 +90,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # DB test dạng file: các test nhiều thread (TransactionTestCase) cần mỗi thread chờ khoá ghi;
+        # DB test trong bộ nhớ (mặc định) báo lỗi 'database table is locked' ngay thay vì chờ
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -155,4 +159,40 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Login URL
 LOGIN_URL = '/accounts/login/'
 
-
+# Session storage: chọn bằng biến môi trường DKMV_SESSION_STORAGE
+#   'db'             – bảng django_session (mặc định)
+#   'cached_db'      – đọc qua cache, ghi xuống DB (nên cấu hình CACHES dùng chung, vd. Redis / Memcached)
+#   'signed_cookies' – lưu trong cookie đã ký, không đụng DB (dữ liệu session phải nhỏ và JSON được)
+# Dữ liệu giỏ hàng / coupon trong session (cart_id, cart_count, coupon_id, coupon_percent) dùng được với cả 3.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_STORAGE = os.environ.get('DKMV_SESSION_STORAGE', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STORAGE]
+
+
+
+# Cache: các cache theo version (menu, tổng số sản phẩm, coupon, ví coupon), ma trận biến thể và
+# badge giỏ hàng phải dùng chung giữa mọi process / worker, nếu không thì thay đổi ở 1 worker
+# sẽ không tới được worker khác. Chọn bằng biến môi trường DKMV_CACHE_STORAGE
+#   'db'     – bảng dkmv_cache trong DB (mặc định, được tạo bởi migration category 0003)
+#   'redis'  – Redis tại DKMV_CACHE_URL (cần gói redis), nhanh nhất khi chạy nhiều worker
+#   'locmem' – bộ nhớ riêng của từng process, CHỈ dùng khi chạy 1 process (runserver / test)
+CACHE_BACKENDS = {
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'dkmv_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('DKMV_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+CACHE_STORAGE = os.environ.get('DKMV_CACHE_STORAGE', 'db')
+CACHES = {'default': CACHE_BACKENDS[CACHE_STORAGE]}
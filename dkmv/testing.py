@@ -0,0 +1,29 @@
+import threading
+
+from django.db import connections
+
+
+def run_concurrently(calls):
+    """
+    Chạy mỗi hàm trong calls ở 1 thread riêng, cùng xuất phát sau 1 barrier (dùng trong TransactionTestCase).
+    Mỗi thread có connection DB riêng, đóng lại khi xong. Trả về danh sách kết quả theo thứ tự hoàn thành;
+    thread lỗi trả về repr của exception để lỗi hiện ra trong kết quả thay vì mất trong thread.
+    """
+    barrier = threading.Barrier(len(calls))
+    results = []
+
+    def worker(call):
+        try:
+            barrier.wait()
+            results.append(call())
+        except Exception as e:
+            results.append(repr(e))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(call,)) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
@@ -6,7 +6,7 @@ from django.shortcuts import render
 from store.models import Product
 
 def home(request):
-    products = Product.objects.all().filter(is_available=True)
+    products = Product.objects.all().filter(is_available=True).select_related('category')
 
     context = {
         'products': products,
@@ -0,0 +1,103 @@
+import csv
+import datetime
+import tempfile
+
+from django.db.models import Prefetch
+
+from orders.models import Order, OrderProduct
+
+try:
+    import xlsxwriter
+except ImportError:  # xlsxwriter là tuỳ chọn, không có thì chỉ xuất CSV
+    xlsxwriter = None
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    'Order Number', 'Customer', 'Phone', 'Email', 'City', 'Total ($)', 'Status', 'Date',
+    'Product', 'Color', 'Size', 'Quantity', 'Unit Price ($)',
+]
+
+
+def get_export_queryset(start_date=None, end_date=None, status=None):
+    """Đơn đã chốt theo bộ lọc, kèm OrderProduct (prefetch theo từng chunk khi dùng .iterator())."""
+    orders = Order.objects.filter(is_ordered=True)
+    if start_date:
+        orders = orders.filter(created_at__date__gte=start_date)
+    if end_date:
+        orders = orders.filter(created_at__date__lte=end_date)
+    if status:
+        orders = orders.filter(status=status)
+
+    lines = OrderProduct.objects.select_related('product', 'variant').order_by('id')
+    return orders.order_by('-created_at').prefetch_related(Prefetch('orderproduct_set', queryset=lines))
+
+
+def iter_export_rows(orders):
+    """Mỗi dòng sản phẩm của đơn là 1 dòng; đơn không có sản phẩm vẫn có 1 dòng."""
+    for order in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        order_cols = [
+            order.order_number,
+            order.full_name(),
+            order.phone,
+            order.email,
+            order.city,
+            order.order_total,
+            order.status,
+            order.created_at.strftime('%d/%m/%Y %H:%M'),
+        ]
+        items = order.orderproduct_set.all()
+        if not items:
+            yield order_cols + ['', '', '', '', '']
+            continue
+        for item in items:
+            yield order_cols + [
+                item.product.product_name,
+                item.variant.color if item.variant else '',
+                item.variant.size if item.variant else '',
+                item.quantity,
+                item.product_price,
+            ]
+
+
+class Echo:
+    """Buffer giả cho csv.writer: trả về luôn chuỗi vừa ghi để StreamingHttpResponse gửi đi."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(orders):
+    writer = csv.writer(Echo())
+    yield '\ufeff'  # BOM để Excel đọc đúng tiếng Việt
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in iter_export_rows(orders):
+        yield writer.writerow(row)
+
+
+def write_xlsx(orders):
+    """
+    Ghi XLSX ở chế độ constant_memory (từng dòng được flush xuống đĩa ngay),
+    trả về file tạm đã tua về đầu để trả cho FileResponse.
+    Định dạng zip của XLSX chỉ hoàn chỉnh khi wb.close() → tải xuống chỉ bắt đầu sau khi ghi xong toàn bộ.
+    """
+    output = tempfile.TemporaryFile()
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True})
+    ws = wb.add_worksheet('Orders Report')
+    bold = wb.add_format({'bold': True})
+
+    ws.write_row(0, 0, EXPORT_COLUMNS, bold)
+    for row_num, row in enumerate(iter_export_rows(orders), start=1):
+        ws.write_row(row_num, 0, row)
+
+    wb.close()
+    output.seek(0)
+    return output
+
+
+def parse_export_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
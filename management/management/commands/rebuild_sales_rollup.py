@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from management.rollups import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = "Dựng lại bảng tổng hợp doanh số theo ngày (DailySalesRollup) từ lịch sử đơn hàng."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Ngày bắt đầu (YYYY-MM-DD). Mặc định: toàn bộ lịch sử.")
+        parser.add_argument('--until', help="Ngày kết thúc (YYYY-MM-DD). Mặc định: hôm nay.")
+        parser.add_argument('--days', type=int, help="Chỉ dựng lại N ngày gần nhất.")
+
+    def _parse_date(self, value):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Ngày không hợp lệ: {value}")
+
+    def handle(self, *args, **options):
+        start_date = self._parse_date(options['since']) if options['since'] else None
+        end_date = self._parse_date(options['until']) if options['until'] else None
+        if options['days']:
+            start_date = timezone.localdate() - datetime.timedelta(days=options['days'] - 1)
+
+        days = rebuild_sales_rollup(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f"Đã dựng lại {days} ngày doanh số."))
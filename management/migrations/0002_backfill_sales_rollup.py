@@ -0,0 +1,54 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+# Giống ROLLUP_EXCLUDED_STATUSES trong management/rollups.py (migration không import code của app)
+EXCLUDED_STATUSES = ('Returned To Warehouse', 'Cancelled')
+
+
+def backfill_sales_rollup(apps, schema_editor):
+    """Dựng bảng tổng hợp từ toàn bộ đơn đã có, để dashboard không trống sau khi nâng cấp."""
+    Order = apps.get_model('orders', 'Order')
+    OrderProduct = apps.get_model('orders', 'OrderProduct')
+    DailySalesRollup = apps.get_model('management', 'DailySalesRollup')
+    DailyProductRollup = apps.get_model('management', 'DailyProductRollup')
+
+    orders = Order.objects.filter(is_ordered=True).exclude(status__in=EXCLUDED_STATUSES)
+    lines = OrderProduct.objects.filter(order__is_ordered=True).exclude(order__status__in=EXCLUDED_STATUSES)
+
+    day_totals = orders.annotate(day=TruncDate('created_at')).values('day').annotate(
+        revenue=Sum('order_total'), order_count=Count('id')).order_by('day')
+    units_by_day = {
+        row['day']: row['units'] or 0
+        for row in lines.annotate(day=TruncDate('order__created_at')).values('day').annotate(
+            units=Sum('quantity')).order_by('day')
+    }
+    product_totals = lines.annotate(day=TruncDate('order__created_at')).values(
+        'day', 'product_id', 'product__category_id').annotate(
+        units=Sum('quantity'), lines=Count('id')).order_by('day')
+
+    DailySalesRollup.objects.all().delete()
+    DailyProductRollup.objects.all().delete()
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(date=row['day'], revenue=row['revenue'] or 0, order_count=row['order_count'],
+                         units=units_by_day.get(row['day'], 0))
+        for row in day_totals
+    ], batch_size=500)
+    DailyProductRollup.objects.bulk_create([
+        DailyProductRollup(date=row['day'], product_id=row['product_id'], category_id=row['product__category_id'],
+                           units=row['units'] or 0, lines=row['lines'])
+        for row in product_totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0001_initial'),
+        ('orders', '0005_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollup, migrations.RunPython.noop),
+    ]
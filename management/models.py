@@ -1,3 +1,40 @@
 from django.db import models
 
-# Create your models here.
+from category.models import Category
+from store.models import Product
+
+
+class DailySalesRollup(models.Model):
+    """
+    Tổng hợp doanh số theo ngày cho trang báo cáo thống kê.
+    Mỗi ngày 1 dòng, được cập nhật dần khi đơn hàng được chốt / đổi trạng thái
+    (xem management/rollups.py) và có thể dựng lại bằng lệnh rebuild_sales_rollup.
+    """
+    date = models.DateField(unique=True)
+    revenue = models.FloatField(default=0)
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue} ({self.order_count} orders)"
+
+
+class DailyProductRollup(models.Model):
+    """Số lượng bán của từng sản phẩm trong ngày (dùng cho biểu đồ ngành hàng & top sản phẩm)."""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    units = models.IntegerField(default=0)
+    lines = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'product')
+        indexes = [
+            models.Index(fields=['date', 'category']),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.product_id} x {self.units}"
@@ -0,0 +1,147 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderProduct
+from .models import DailySalesRollup, DailyProductRollup
+
+
+# Đơn ở các trạng thái này không được tính vào doanh số
+ROLLUP_EXCLUDED_STATUSES = ('Returned To Warehouse', 'Cancelled')
+
+ROLLUP_BATCH_SIZE = 100
+
+
+def is_counted(order, status=None):
+    status = order.status if status is None else status
+    return order.is_ordered and status not in ROLLUP_EXCLUDED_STATUSES
+
+
+def _add_product_lines(day, lines, sign):
+    """
+    UPDATE management_dailyproductrollup
+    SET units = units + CASE WHEN product_id IN (..) THEN .. END, lines = lines + CASE ..
+    WHERE date = .. AND product_id IN (..)
+    Các sản phẩm có cùng giá trị được gom vào 1 nhánh WHEN → số nhánh theo số giá trị khác nhau,
+    không theo số sản phẩm của đơn.
+    """
+    def by_product(field):
+        product_ids = {}
+        for line in lines:
+            product_ids.setdefault(sign * line[field], []).append(line['product_id'])
+        return Case(
+            *[When(product_id__in=ids, then=value) for value, ids in product_ids.items()],
+            output_field=IntegerField(),
+        )
+
+    DailyProductRollup.objects.filter(date=day, product_id__in=[line['product_id'] for line in lines]).update(
+        units=F('units') + by_product('units'),
+        lines=F('lines') + by_product('lines'),
+    )
+
+
+def _apply_order(order, sign):
+    """Cộng (sign=1) hoặc trừ (sign=-1) 1 đơn hàng vào bảng tổng hợp của ngày đặt hàng."""
+    day = timezone.localdate(order.created_at)
+
+    lines = OrderProduct.objects.filter(order=order).values('product_id', 'product__category_id').annotate(
+        units=Sum('quantity'), lines=Count('id'))
+    lines = list(lines)
+    units = sum(line['units'] for line in lines)
+
+    with transaction.atomic():
+        DailySalesRollup.objects.get_or_create(date=day)
+        DailySalesRollup.objects.filter(date=day).update(
+            revenue=F('revenue') + sign * order.order_total,
+            order_count=F('order_count') + sign,
+            units=F('units') + sign * units,
+        )
+
+        if not lines:
+            return
+
+        DailyProductRollup.objects.bulk_create([
+            DailyProductRollup(date=day, product_id=line['product_id'], category_id=line['product__category_id'])
+            for line in lines
+        ], ignore_conflicts=True)
+        # Cập nhật tất cả sản phẩm của đơn bằng UPDATE ... CASE (mỗi câu tối đa ROLLUP_BATCH_SIZE sản phẩm)
+        for start in range(0, len(lines), ROLLUP_BATCH_SIZE):
+            _add_product_lines(day, lines[start:start + ROLLUP_BATCH_SIZE], sign)
+
+
+def record_order(order):
+    """Gọi sau khi đơn đã được chốt (is_ordered=True) và đã có OrderProduct."""
+    if is_counted(order):
+        _apply_order(order, 1)
+
+
+def update_order_status(order, old_status):
+    """Gọi sau khi đổi order.status: chỉ cập nhật khi đơn chuyển giữa tính / không tính doanh số."""
+    was_counted = is_counted(order, old_status)
+    now_counted = is_counted(order)
+    if was_counted and not now_counted:
+        _apply_order(order, -1)
+    elif now_counted and not was_counted:
+        _apply_order(order, 1)
+
+
+def rebuild_sales_rollup(start_date=None, end_date=None):
+    """
+    Dựng lại bảng tổng hợp từ Order / OrderProduct cho khoảng [start_date, end_date]
+    (mặc định: toàn bộ lịch sử). Trả về số ngày đã ghi.
+    """
+    orders = Order.objects.filter(is_ordered=True).exclude(status__in=ROLLUP_EXCLUDED_STATUSES)
+    lines = OrderProduct.objects.filter(order__is_ordered=True).exclude(
+        order__status__in=ROLLUP_EXCLUDED_STATUSES)
+    rollups = DailySalesRollup.objects.all()
+    product_rollups = DailyProductRollup.objects.all()
+
+    if start_date:
+        orders = orders.filter(created_at__date__gte=start_date)
+        lines = lines.filter(order__created_at__date__gte=start_date)
+        rollups = rollups.filter(date__gte=start_date)
+        product_rollups = product_rollups.filter(date__gte=start_date)
+    if end_date:
+        orders = orders.filter(created_at__date__lte=end_date)
+        lines = lines.filter(order__created_at__date__lte=end_date)
+        rollups = rollups.filter(date__lte=end_date)
+        product_rollups = product_rollups.filter(date__lte=end_date)
+
+    day_totals = orders.annotate(day=TruncDate('created_at')).values('day').annotate(
+        revenue=Sum('order_total'), order_count=Count('id')).order_by('day')
+    day_units = lines.annotate(day=TruncDate('order__created_at')).values('day').annotate(
+        units=Sum('quantity')).order_by('day')
+    product_totals = lines.annotate(day=TruncDate('order__created_at')).values(
+        'day', 'product_id', 'product__category_id').annotate(
+        units=Sum('quantity'), lines=Count('id')).order_by('day')
+
+    day_totals = list(day_totals)
+    units_by_day = {row['day']: row['units'] or 0 for row in day_units}
+
+    with transaction.atomic():
+        rollups.delete()
+        product_rollups.delete()
+
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(
+                date=row['day'],
+                revenue=row['revenue'] or 0,
+                order_count=row['order_count'],
+                units=units_by_day.get(row['day'], 0),
+            )
+            for row in day_totals
+        ], batch_size=500)
+
+        DailyProductRollup.objects.bulk_create([
+            DailyProductRollup(
+                date=row['day'],
+                product_id=row['product_id'],
+                category_id=row['product__category_id'],
+                units=row['units'] or 0,
+                lines=row['lines'],
+            )
+            for row in product_totals
+        ], batch_size=500)
+
+    return len(day_totals)
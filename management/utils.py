@@ -1,4 +1,5 @@
-from django.db.models import Sum, Count
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
 from django.utils import timezone
 from datetime import timedelta
 import datetime
@@ -6,8 +7,9 @@ import json
 
 # Import Models
 from store.models import Product
-from orders.models import Order, OrderProduct
+from orders.models import Order
 from accounts.models import Account
+from .models import DailySalesRollup, DailyProductRollup
 
 
 # --- 1. HÀM PHỤ TRỢ: TÍNH KHOẢNG THỜI GIAN ---
@@ -51,13 +53,16 @@ def get_date_range(period):
 def get_kpi_data(period='7days'):
     start_date, end_date, prev_start, prev_end = get_date_range(period)
 
+    # Đọc từ bảng tổng hợp theo ngày (DailySalesRollup) thay vì quét toàn bộ Order
+    end_day = timezone.localdate(end_date) if isinstance(end_date, datetime.datetime) else end_date
+    current = DailySalesRollup.objects.filter(date__range=[start_date, end_day]).aggregate(
+        revenue=Sum('revenue'), orders=Sum('order_count'))
+    prev = DailySalesRollup.objects.filter(date__range=[prev_start, prev_end]).aggregate(
+        revenue=Sum('revenue'), orders=Sum('order_count'))
+
     # 1. Revenue (Doanh thu trong khoảng chọn)
-    rev_current = \
-    Order.objects.filter(is_ordered=True, created_at__range=[start_date, end_date]).aggregate(Sum('order_total'))[
-        'order_total__sum'] or 0
-    rev_prev = \
-    Order.objects.filter(is_ordered=True, created_at__range=[prev_start, prev_end]).aggregate(Sum('order_total'))[
-        'order_total__sum'] or 0
+    rev_current = current['revenue'] or 0
+    rev_prev = prev['revenue'] or 0
 
     # Growth Rate
     if rev_prev > 0:
@@ -68,8 +73,8 @@ def get_kpi_data(period='7days'):
         growth_rate = 0.0
 
     # 2. Orders
-    orders_current = Order.objects.filter(is_ordered=True, created_at__range=[start_date, end_date]).count()
-    orders_prev = Order.objects.filter(is_ordered=True, created_at__range=[prev_start, prev_end]).count()
+    orders_current = current['orders'] or 0
+    orders_prev = prev['orders'] or 0
 
     if orders_prev > 0:
         order_growth = ((orders_current - orders_prev) / orders_prev) * 100
@@ -83,7 +88,7 @@ def get_kpi_data(period='7days'):
     new_customers = Account.objects.filter(date_joined__range=[start_date, end_date]).count()  # User mới trong kỳ
 
     # 4. Sell Rate
-    sold_units = OrderProduct.objects.filter(ordered=True).aggregate(Sum('quantity'))['quantity__sum'] or 0
+    sold_units = DailySalesRollup.objects.aggregate(Sum('units'))['units__sum'] or 0
     total_stock = Product.objects.aggregate(Sum('stock'))['stock__sum'] or 0
     sell_rate = round((sold_units / (total_stock + sold_units) * 100), 1) if (total_stock + sold_units) > 0 else 0
 
@@ -105,48 +110,105 @@ def get_kpi_data(period='7days'):
 
 
 # --- 3. CHART DATA (CẬP NHẬT ĐỂ NHẬN THAM SỐ PERIOD) ---
-def get_chart_data(period='7days'):
-    start_date, end_date, _, _ = get_date_range(period)
-
-    dates_list = []
+# Độ chi tiết (bucket) của trục thời gian -> hàm Trunc tương ứng trong DB
+CHART_BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+CHART_BUCKET_LABELS = {
+    'day': '%d/%m',
+    'week': '%d/%m',
+    'month': '%m/%Y',
+}
+
+
+def get_bucket_size(start_date, end_date):
+    """Tự chọn bucket theo độ dài khoảng thời gian để số điểm trên biểu đồ luôn vừa phải."""
+    days_range = (end_date - start_date).days + 1
+    if days_range <= 31:
+        return 'day'
+    if days_range <= 92:
+        return 'week'
+    return 'month'
+
+
+def _bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())  # TruncWeek: tuần bắt đầu từ thứ Hai
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def get_revenue_series(start_date, end_date, bucket=None):
+    """
+    Doanh thu + số đơn theo từng bucket trong [start_date, end_date] bằng 1 query GROUP BY
+    trên bảng tổng hợp theo ngày (DailySalesRollup).
+    Các bucket không có đơn được điền 0 ở Python.
+    Trả về (labels, revenue_list, orders_count_list).
+    """
+    if bucket is None:
+        bucket = get_bucket_size(start_date, end_date)
+
+    rows = DailySalesRollup.objects.filter(date__range=[start_date, end_date]).annotate(
+        bucket=CHART_BUCKETS[bucket]('date')).values('bucket').annotate(
+        revenue=Sum('revenue'), orders=Sum('order_count')).order_by('bucket')
+
+    totals = {}
+    for row in rows:
+        key = row['bucket']
+        # Phòng trường hợp backend trả về datetime thay vì date
+        if isinstance(key, datetime.datetime): key = key.date()
+        totals[key] = (float(row['revenue'] or 0), row['orders'])
+
+    labels = []
     revenue_list = []
     orders_count_list = []
 
-    # Tính số ngày cần vẽ
-    # Lưu ý: end_date có thể là datetime, start_date có thể là date, cần ép kiểu về date để trừ
-    if isinstance(end_date, datetime.datetime): end_date = end_date.date()
-    if isinstance(start_date, datetime.datetime): start_date = start_date.date()
+    current = _bucket_start(start_date, bucket)
+    while current <= end_date:
+        revenue, orders = totals.get(current, (0.0, 0))
+        labels.append(current.strftime(CHART_BUCKET_LABELS[bucket]))
+        revenue_list.append(revenue)
+        orders_count_list.append(orders)
+        current = _next_bucket(current, bucket)
 
-    days_range = (end_date - start_date).days + 1
+    return labels, revenue_list, orders_count_list
 
-    # Vẽ biểu đồ theo ngày
-    for i in range(days_range):
-        current_date = start_date + timedelta(days=i)
-        dates_list.append(current_date.strftime('%d/%m'))
 
-        daily_data = Order.objects.filter(is_ordered=True, created_at__date=current_date)
+def get_chart_data(period='7days'):
+    start_date, end_date, _, _ = get_date_range(period)
 
-        daily_rev = daily_data.aggregate(Sum('order_total'))['order_total__sum'] or 0
-        revenue_list.append(float(daily_rev))
+    # Lưu ý: end_date có thể là datetime, start_date có thể là date, cần ép kiểu về date để trừ
+    if isinstance(end_date, datetime.datetime): end_date = end_date.date()
+    if isinstance(start_date, datetime.datetime): start_date = start_date.date()
 
-        daily_count = daily_data.count()
-        orders_count_list.append(daily_count)
+    # Vẽ biểu đồ: 1 query cho cả khoảng, bucket tự chọn theo độ dài kỳ
+    dates_list, revenue_list, orders_count_list = get_revenue_series(start_date, end_date)
 
     # Chart Growth (Tái sử dụng logic đơn giản hoặc tính kỹ hơn tùy ý)
     chart_growth = 0
     if sum(revenue_list) > 0: chart_growth = 100
 
-    # Pie & Bar Charts (Lọc theo khoảng thời gian đã chọn)
-    # Cần convert start_date/end_date về datetime để filter range chính xác nếu cần
-    # Ở đây dùng __date__range cho đơn giản
+    # Pie & Bar Charts (Lọc theo khoảng thời gian đã chọn, đọc từ DailyProductRollup)
 
-    cat_stats = OrderProduct.objects.filter(ordered=True, created_at__date__range=[start_date, end_date]).values(
-        'product__category__category_name').annotate(count=Count('id')).order_by('-count')[:5]
-    cat_labels = [x['product__category__category_name'] for x in cat_stats]
+    cat_stats = DailyProductRollup.objects.filter(date__range=[start_date, end_date]).values(
+        'category__category_name').annotate(count=Sum('lines')).order_by('-count')[:5]
+    cat_labels = [x['category__category_name'] for x in cat_stats]
     cat_data = [x['count'] for x in cat_stats]
 
-    top_prods = OrderProduct.objects.filter(ordered=True, created_at__date__range=[start_date, end_date]).values(
-        'product__product_name').annotate(qty=Sum('quantity')).order_by('-qty')[:5]
+    top_prods = DailyProductRollup.objects.filter(date__range=[start_date, end_date]).values(
+        'product__product_name').annotate(qty=Sum('units')).order_by('-qty')[:5]
     prod_labels = [x['product__product_name'] for x in top_prods]
     prod_data = [x['qty'] for x in top_prods]
 
@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+
+from carts.models import CartItem
+from coupons.redemption import redeem_coupon
+from management.rollups import record_order
+from store.models import ProductVariant
+from store.stock import apply_stock_deltas
+from store.variants import invalidate_variant_matrix
+from .models import Order, Payment, OrderProduct
+
+
+class OutOfStockError(Exception):
+    """
+    Một dòng trong giỏ hàng vượt quá tồn kho hiện tại của biến thể.
+    cart_item là dòng thiếu hàng, None nếu không xác định được dòng nào (reason dùng câu chung).
+    """
+
+    def __init__(self, cart_item=None):
+        self.cart_item = cart_item
+        if cart_item is None:
+            self.reason = "Một số sản phẩm trong giỏ hàng không đủ hàng trong kho. Vui lòng cập nhật giỏ hàng."
+        else:
+            self.reason = f"Sản phẩm {cart_item} không đủ hàng trong kho. Vui lòng cập nhật giỏ hàng."
+        super().__init__(self.reason)
+
+
+class OrderAlreadyPlacedError(Exception):
+    """Đơn đã được chốt bởi 1 request khác (ví dụ bấm xác nhận 2 lần)."""
+
+
+ORDER_LINE_BATCH_SIZE = 500
+STOCK_UPDATE_BATCH_SIZE = 100
+
+
+def _decrement_stock_batch(batch, quantities):
+    """
+    1 câu UPDATE cho cả batch:
+      UPDATE store_productvariant SET stock = stock - CASE WHEN id IN (..) THEN qty .. END
+      WHERE id IN (..) AND stock >= CASE WHEN id IN (..) THEN qty .. END
+    Mỗi số lượng khác nhau là 1 nhánh WHEN (giỏ hàng thường chỉ có vài số lượng khác nhau),
+    nên chi phí dựng Case/When không tăng theo số dòng giỏ hàng.
+    Trả về số biến thể đã được trừ.
+    """
+    by_quantity = {}
+    for variant_id in batch:
+        by_quantity.setdefault(quantities[variant_id], []).append(variant_id)
+    amount = Case(
+        *[When(pk__in=variant_ids, then=quantity) for quantity, variant_ids in by_quantity.items()],
+        output_field=IntegerField(),
+    )
+    return ProductVariant.objects.filter(pk__in=batch, stock__gte=amount).update(stock=F('stock') - amount)
+
+
+def decrement_stock(cart_items):
+    """
+    Trừ tồn kho cho cả giỏ hàng, mỗi câu UPDATE tối đa STOCK_UPDATE_BATCH_SIZE biến thể,
+    chỉ trừ khi stock >= quantity.
+    Nếu số dòng được cập nhật ít hơn số biến thể → có dòng không đủ hàng → OutOfStockError.
+    Phải gọi bên trong transaction để các batch trước cũng được rollback khi lỗi.
+    """
+    quantities = {}
+    for item in cart_items:
+        if item.variant_id is not None:
+            quantities[item.variant_id] = quantities.get(item.variant_id, 0) + item.quantity
+
+    variant_ids = list(quantities)
+    for start in range(0, len(variant_ids), STOCK_UPDATE_BATCH_SIZE):
+        batch = variant_ids[start:start + STOCK_UPDATE_BATCH_SIZE]
+
+        try:
+            with transaction.atomic():
+                if _decrement_stock_batch(batch, quantities) != len(batch):
+                    raise OutOfStockError()
+        except OutOfStockError:
+            # Savepoint đã rollback phần vừa trừ → đọc lại tồn kho để báo đúng dòng thiếu hàng
+            stocks = dict(ProductVariant.objects.filter(pk__in=batch).values_list('pk', 'stock'))
+            for item in cart_items:
+                if item.variant_id in batch and stocks.get(item.variant_id, 0) < quantities[item.variant_id]:
+                    raise OutOfStockError(item)
+            # Không dòng nào thiếu hàng khi đọc lại (tồn kho vừa được cộng thêm) → báo chung
+            raise OutOfStockError()
+
+    # Giữ Product.stock (tổng tồn kho biến thể) khớp với phần vừa trừ
+    product_deltas = {}
+    for item in cart_items:
+        if item.variant_id is not None:
+            product_deltas[item.product_id] = product_deltas.get(item.product_id, 0) - item.quantity
+    apply_stock_deltas(product_deltas)
+    invalidate_variant_matrix(product_deltas)
+
+
+def finalize_order(order, cart_items):
+    """
+    Chốt đơn COD trong 1 transaction:
+    - đánh dấu order.is_ordered (có điều kiện, chống bấm 2 lần)
+    - giữ 1 lượt coupon của đơn (redeem_coupon: tăng Coupon.redeemed_count có điều kiện + tạo CouponUsage)
+    - trừ ProductVariant.stock bằng UPDATE ... CASE có điều kiện stock >= quantity (decrement_stock),
+      kèm delta tương ứng cho Product.stock
+    - bulk_create OrderProduct, xoá giỏ hàng bằng 1 câu DELETE
+    Lỗi ở bất kỳ bước nào thì toàn bộ được rollback.
+    Trả về Payment vừa tạo.
+    """
+    user = order.user
+
+    with transaction.atomic():
+        payment = Payment.objects.create(
+            user=user,
+            payment_id=f"COD-{order.order_number}",
+            payment_method="COD",
+            amount_paid=order.order_total,
+            status="Pending",
+        )
+
+        placed = Order.objects.filter(pk=order.pk, is_ordered=False).update(payment=payment, is_ordered=True)
+        if not placed:
+            raise OrderAlreadyPlacedError(order.order_number)
+        order.payment = payment
+        order.is_ordered = True
+
+        redeem_coupon(order)
+        decrement_stock(cart_items)
+
+        OrderProduct.objects.bulk_create([
+            OrderProduct(
+                order=order,
+                payment=payment,
+                user=user,
+                product_id=item.product_id,
+                variant_id=item.variant_id,
+                quantity=item.quantity,
+                product_price=item.product.price,
+                ordered=True,
+            )
+            for item in cart_items
+        ], batch_size=ORDER_LINE_BATCH_SIZE)
+
+        CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+        record_order(order)
+
+    return payment
@@ -1,3 +1,94 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from accounts.models import Account
+from carts.models import CartItem
+from category.models import Category
+from management.models import DailyProductRollup, DailySalesRollup
+from management.rollups import rebuild_sales_rollup
+from store.models import Product, ProductVariant
+from .checkout import OutOfStockError, finalize_order
+from .models import Order, OrderProduct
+
+
+class FinalizeOrderTests(TestCase):
+    """
+    Chốt đơn theo batch: số query không tăng theo số dòng giỏ hàng (10 dòng hay 50 dòng như nhau;
+    trên 50 dòng thì bulk_create OrderProduct bắt đầu tách câu theo giới hạn tham số của SQLite).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Account.objects.create_user('An', 'Nguyen', 'an', 'an@example.com', 'secret')
+        category = Category.objects.create(category_name='Áo', slug='ao')
+        cls.variants = []
+        for i in range(61):
+            product = Product.objects.create(
+                product_name=f'Áo {i}', slug=f'ao-{i}', price=10, images='x.png', category=category)
+            cls.variants.append(ProductVariant.objects.create(product=product, color='Red', size='M', stock=5))
+
+    def _order(self):
+        return Order.objects.create(
+            user=self.user, order_number=f'T{Order.objects.count()}', first_name='An', last_name='Nguyen',
+            phone='0900000000', email='an@example.com', address_line_1='1 Le Loi', country='VN', city='HCM',
+            order_total=100, VAT=2,
+        )
+
+    def _cart(self, variants):
+        CartItem.objects.bulk_create([
+            CartItem(user=self.user, product_id=variant.product_id, variant=variant, quantity=1 + i % 2)
+            for i, variant in enumerate(variants)
+        ])
+        return list(CartItem.objects.filter(user=self.user).select_related('product', 'variant'))
+
+    def _checkout(self, variants):
+        order = self._order()
+        items = self._cart(variants)
+        with CaptureQueriesContext(connection) as queries:
+            finalize_order(order, items)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self._checkout(self.variants[:1])  # tạo sẵn dòng tổng hợp của ngày
+        small = self._checkout(self.variants[1:11])
+        large = self._checkout(self.variants[11:61])
+        self.assertEqual(small, large)
+
+        for i, variant in enumerate(self.variants[11:61]):
+            variant.refresh_from_db()
+            self.assertEqual(variant.stock, 5 - (1 + i % 2))
+            self.assertEqual(Product.objects.get(pk=variant.product_id).stock, variant.stock)
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_rollup_matches_rebuild_after_checkout(self):
+        self._checkout(self.variants[:20])
+        self._checkout(self.variants[10:30])
+        recorded = (
+            list(DailySalesRollup.objects.values_list('date', 'revenue', 'order_count', 'units')),
+            sorted(DailyProductRollup.objects.values_list('date', 'product_id', 'units', 'lines')),
+        )
+        rebuild_sales_rollup()
+        rebuilt = (
+            list(DailySalesRollup.objects.values_list('date', 'revenue', 'order_count', 'units')),
+            sorted(DailyProductRollup.objects.values_list('date', 'product_id', 'units', 'lines')),
+        )
+        self.assertEqual(recorded, rebuilt)
+
+    def test_out_of_stock_line_rolls_back_whole_order(self):
+        short = self.variants[7]
+        ProductVariant.objects.filter(pk=short.pk).update(stock=0)
+        order = self._order()
+        items = self._cart(self.variants[:20])
+
+        with self.assertRaises(OutOfStockError) as ctx:
+            finalize_order(order, items)
+
+        self.assertEqual(ctx.exception.cart_item.variant_id, short.pk)
+        self.assertIn('Áo 7', ctx.exception.reason)
+        self.assertEqual(ProductVariant.objects.get(pk=self.variants[0].pk).stock, 5)
+        self.assertFalse(Order.objects.get(pk=order.pk).is_ordered)
+        self.assertFalse(OrderProduct.objects.exists())
+
+    def test_unknown_line_gets_generic_reason(self):
+        self.assertNotIn('None', OutOfStockError().reason)
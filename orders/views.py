@@ -1,13 +1,17 @@
 from django.shortcuts import render, redirect
 from django.http import HttpResponse
 from django.contrib import messages
+from django.db import transaction
 from django.utils import timezone
 
 from django.contrib.auth.decorators import login_required
 
 from carts.models import CartItem
-from store.models import ProductVariant
-from coupons.models import Coupon
+from carts.utils import reset_cart_count
+from carts.pricing import CartPricer, drop_invalid_coupon
+from coupons.redemption import CouponRedemptionError, update_order_coupon
+from management.rollups import update_order_status
+from .checkout import finalize_order, OutOfStockError, OrderAlreadyPlacedError
 from .forms import OrderForm
 from .models import Order, Payment, OrderProduct
 
@@ -17,7 +21,7 @@ import datetime
 # ==========================================================
 # PLACE ORDER
 # ==========================================================
-def place_order(request, total=0, quantity=0):
+def place_order(request):
     current_user = request.user
 
     # ========================================
@@ -29,31 +33,17 @@ def place_order(request, total=0, quantity=0):
     # ========================================
 
     cart_items = CartItem.objects.filter(user=current_user)
-    if not cart_items.exists():
+
+    # TÍNH TỔNG TIỀN + COUPON (dùng chung với trang cart / checkout)
+    pricing = CartPricer.for_session(cart_items, request.session, current_user)
+    if pricing.coupon_error:
+        # Coupon hết hạn / hết lượt kể từ lúc áp → quay lại checkout để khách thấy giá mới
+        drop_invalid_coupon(request, pricing)
+        return redirect('checkout')
+    if not pricing.items:
         return redirect('store')
 
-    # TÍNH TỔNG TIỀN
-    for item in cart_items:
-        total += item.product.price * item.quantity
-        quantity += item.quantity
-
-    # COUPON
-    coupon_percent = int(request.session.get("coupon_percent", 0))
-    coupon_id = request.session.get("coupon_id")
-    coupon_code = None
-
-    discount_amount = 0
-    if coupon_id:
-        try:
-            coupon_obj = Coupon.objects.get(id=coupon_id)
-            coupon_code = coupon_obj.code
-            discount_amount = round(total * (coupon_percent / 100), 2)
-        except Coupon.DoesNotExist:
-            pass
-
-    sub_total_after_discount = total - discount_amount
-    VAT = round(sub_total_after_discount * 0.08, 2)
-    grand_total = round(sub_total_after_discount + VAT, 2)
+    coupon_code = pricing.coupon.code if pricing.coupon else None
 
     # SUBMIT FORM
     if request.method == "POST":
@@ -72,9 +62,9 @@ def place_order(request, total=0, quantity=0):
             order.city = form.cleaned_data['city']
             order.order_note = form.cleaned_data['order_note']
 
-            order.order_total = grand_total
-            order.VAT = VAT
-            order.discount = discount_amount
+            order.order_total = pricing.grand_total
+            order.VAT = pricing.VAT
+            order.discount = pricing.discount_amount
             order.coupon = coupon_code
             order.ip = request.META.get('REMOTE_ADDR')
             order.save()
@@ -86,12 +76,12 @@ def place_order(request, total=0, quantity=0):
 
             context = {
                 'order': order,
-                'cart_items': cart_items,
-                'total': total,
-                'discount_amount': discount_amount,
-                'sub_total_after_discount': sub_total_after_discount,
-                'VAT': VAT,
-                'grand_total': grand_total,
+                'cart_items': pricing.items,
+                'total': pricing.total,
+                'discount_amount': pricing.discount_amount,
+                'sub_total_after_discount': pricing.discounted_subtotal,
+                'VAT': pricing.VAT,
+                'grand_total': pricing.grand_total,
             }
             return render(request, 'orders/confirm_cod_payment.html', context)
 
@@ -114,46 +104,29 @@ def confirm_cod_payment(request):
     except Order.DoesNotExist:
         return redirect('home')
 
-    cart_items = CartItem.objects.filter(user=current_user)
-    if not cart_items.exists():
+    cart_items = list(CartItem.objects.filter(user=current_user).select_related('product'))
+    if not cart_items:
         return redirect('store')
 
-    # TẠO PAYMENT
-    payment = Payment.objects.create(
-        user=current_user,
-        payment_id=f"COD-{order_number}",
-        payment_method="COD",
-        amount_paid=order.order_total,
-        status="Pending",
-    )
+    # TẠO PAYMENT, TRỪ STOCK, CHUYỂN CART → ORDERPRODUCT (1 transaction)
+    try:
+        payment = finalize_order(order, cart_items)
+    except OrderAlreadyPlacedError:
+        return redirect('home')
+    except OutOfStockError as e:
+        messages.error(request, e.reason)
+        return redirect('cart')
+    except CouponRedemptionError as e:
+        # Mã vừa hết lượt (khách khác dùng trước) → bỏ mã, quay lại checkout để khách thấy giá mới
+        request.session.pop("coupon_id", None)
+        request.session.pop("coupon_percent", None)
+        messages.warning(request, e.reason)
+        return redirect('checkout')
 
-    # GẮN PAYMENT
-    order.payment = payment
-    order.is_ordered = True
-    order.save()
-
-    # CHUYỂN CART → ORDERPRODUCT
-    for item in cart_items:
-        op = OrderProduct.objects.create(
-            order=order,
-            payment=payment,
-            user=current_user,
-            product=item.product,
-            quantity=item.quantity,
-            product_price=item.product.price,
-            variant=item.variant,   # 🔥 LƯU BIẾN THỂ
-            ordered=True
-        )
-
-        # 🔥 TRỪ STOCK TRONG BIẾN THỂ
-        pv = item.variant
-        pv.stock -= item.quantity
-        if pv.stock < 0:
-            pv.stock = 0
-        pv.save()
-
-    # XOÁ CART
-    cart_items.delete()
+    # Coupon đã được dùng cho đơn này
+    request.session.pop("coupon_id", None)
+    request.session.pop("coupon_percent", None)
+    reset_cart_count(request)
 
     return redirect(
         f'/orders/order_complete/?order_number={order.order_number}&payment_id={payment.payment_id}'
@@ -210,8 +183,13 @@ def order_detail(request, order_number):
        if request.method == 'POST' and user.role in ['admin', 'staff']:
            new_status = request.POST.get('status')
            if new_status in dict(Order.STATUS):
+               old_status = order.status
                order.status = new_status
-               order.save()
+               # Trạng thái, bảng tổng hợp doanh số và lượt coupon đổi cùng nhau hoặc không đổi gì
+               with transaction.atomic():
+                   order.save()
+                   update_order_status(order, old_status)
+                   update_order_coupon(order, old_status)
                messages.success(request, f'Order status updated to {new_status}')
                return redirect('order_detail', order_number=order_number)
 
@@ -13,6 +13,7 @@ from .models import (
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('product_name', 'price', 'stock', 'category', 'modified_date', 'is_available')
     prepopulated_fields = {'slug': ('product_name',)}
+    readonly_fields = ('stock',)  # tổng tồn kho biến thể, xem store/stock.py
 
 
 # ===========================
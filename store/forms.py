@@ -7,7 +7,7 @@ class ProductForm(forms.ModelForm):
         model = Product
         fields = [
             'product_name', 'slug', 'description', 'price',
-            'images', 'stock', 'is_available', 'category'
+            'images', 'is_available', 'category'
         ]
         widgets = {
             'product_name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -15,7 +15,6 @@ class ProductForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'class': 'form-control'}),
             'price': forms.NumberInput(attrs={'class': 'form-control'}),
             'images': forms.ClearableFileInput(attrs={'class': 'form-control'}),
-            'stock': forms.NumberInput(attrs={'class': 'form-control'}),
             'category': forms.Select(attrs={'class': 'form-control'}),}
 
 
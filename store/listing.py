@@ -0,0 +1,119 @@
+import base64
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from dkmv.cache import bump_version, get_version
+from .models import Product
+
+
+# Trang cửa hàng phân trang theo keyset (cursor) trên (created_date, id), mới nhất trước:
+# mỗi trang chỉ cần "WHERE (created_date, id) < cursor ORDER BY ... LIMIT n" nên trang sâu
+# cũng nhanh như trang đầu (không OFFSET, không đếm lại cả bảng mỗi request).
+LISTING_PAGE_SIZE = 10
+LISTING_ORDERING = ('-created_date', '-id')
+
+# Tổng số sản phẩm được cache theo version, version tăng khi Product thay đổi (store/signals.py)
+COUNT_VERSION_KEY = 'store:listing:count:version'
+COUNT_CACHE_TIMEOUT = 60 * 60
+
+
+def get_count_version():
+    return get_version(COUNT_VERSION_KEY)
+
+
+def bump_count_version():
+    bump_version(COUNT_VERSION_KEY)
+
+
+def get_listing_queryset(category=None):
+    products = Product.objects.filter(is_available=True)
+    if category is not None:
+        products = products.filter(category=category)
+    # get_url() cần category.slug → lấy luôn trong 1 query
+    return products.select_related('category')
+
+
+def get_product_count(category=None):
+    key = f'store:listing:count:{get_count_version()}:{category.pk if category else "all"}'
+    count = cache.get(key)
+    if count is None:
+        count = get_listing_queryset(category).count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def encode_cursor(product, direction):
+    """direction: 'n' = các sản phẩm sau product, 'p' = các sản phẩm trước product."""
+    raw = f'{direction}|{product.created_date.isoformat()}|{product.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Trả về (direction, created_date, id) hoặc None nếu cursor sai định dạng."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        direction, created_date, pk = raw.split('|')
+        if direction not in ('n', 'p'):
+            return None
+        return direction, datetime.datetime.fromisoformat(created_date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class ListingPage:
+    """
+    1 trang sản phẩm, có các thuộc tính giống Page của Paginator mà template đang dùng
+    (has_previous / has_next / has_other_pages), thay số trang bằng cursor.
+    """
+
+    def __init__(self, items, has_previous, has_next):
+        self.items = items
+        self.has_previous = has_previous
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.items[0], 'p') if self.has_previous and self.items else None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.items[-1], 'n') if self.has_next and self.items else None
+
+
+def get_listing_page(queryset, cursor=None, page_size=LISTING_PAGE_SIZE):
+    position = decode_cursor(cursor)
+
+    if position is None:
+        items = list(queryset.order_by(*LISTING_ORDERING)[:page_size + 1])
+        return ListingPage(items[:page_size], has_previous=False, has_next=len(items) > page_size)
+
+    direction, created_date, pk = position
+    if direction == 'n':
+        after = Q(created_date__lt=created_date) | Q(created_date=created_date, id__lt=pk)
+        items = list(queryset.filter(after).order_by(*LISTING_ORDERING)[:page_size + 1])
+        return ListingPage(items[:page_size], has_previous=True, has_next=len(items) > page_size)
+
+    # Trang trước: đọc ngược từ cursor rồi đảo lại thứ tự hiển thị
+    before = Q(created_date__gt=created_date) | Q(created_date=created_date, id__gt=pk)
+    items = list(queryset.filter(before).order_by('created_date', 'id')[:page_size + 1])
+    has_previous = len(items) > page_size
+    items = items[:page_size]
+    items.reverse()
+    return ListingPage(items, has_previous=has_previous, has_next=True)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Dựng lại chỉ mục tìm kiếm sản phẩm (bảng FTS5) từ bảng Product."
+
+    def handle(self, *args, **options):
+        count = get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Đã index {count} sản phẩm."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from store.stock import find_stock_drift, reconcile_product_stock
+
+
+class Command(BaseCommand):
+    help = "Kiểm tra và sửa Product.stock lệch so với tổng tồn kho các ProductVariant."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ liệt kê, không sửa.")
+
+    def handle(self, *args, **options):
+        drift = find_stock_drift()
+        for product_id, stock, stock_total in drift:
+            self.stdout.write(f"#{product_id}: Product.stock={stock}, tổng biến thể={stock_total}")
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Product.stock khớp với tồn kho biến thể."))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} sản phẩm bị lệch (dry run, chưa sửa)."))
+            return
+
+        reconcile_product_stock([product_id for product_id, _, _ in drift])
+        self.stdout.write(self.style.SUCCESS(f"Đã sửa {len(drift)} sản phẩm."))
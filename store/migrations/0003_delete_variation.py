@@ -7,5 +7,7 @@ class Migration(migrations.Migration):
     ]
 
     operations = [
-        # Không thay đổi gì
+        migrations.DeleteModel(
+            name='Variation',
+        ),
     ]
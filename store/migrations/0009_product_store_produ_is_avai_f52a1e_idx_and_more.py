@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_remove_variation_stock_variationcombination'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_available', 'category', 'created_date', 'id'], name='store_produ_is_avai_f52a1e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_available', 'created_date', 'id'], name='store_produ_is_avai_8cfebd_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:03
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def sync_product_stock(apps, schema_editor):
+    # Product.stock từ nay = tổng tồn kho ProductVariant → đồng bộ lại dữ liệu cũ
+    Product = apps.get_model('store', 'Product')
+    ProductVariant = apps.get_model('store', 'ProductVariant')
+    totals = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        total=Sum('stock')).values('total')
+    Product.objects.update(stock=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_product_store_produ_is_avai_f52a1e_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='stock',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(sync_product_stock, migrations.RunPython.noop),
+    ]
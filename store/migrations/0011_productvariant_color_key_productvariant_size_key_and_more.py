@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+def fill_variant_keys(apps, schema_editor):
+    ProductVariant = apps.get_model('store', 'ProductVariant')
+    variants = list(ProductVariant.objects.only('id', 'color', 'size'))
+    for variant in variants:
+        variant.color_key = ' '.join((variant.color or '').split()).lower()
+        variant.size_key = ' '.join((variant.size or '').split()).lower()
+    ProductVariant.objects.bulk_update(variants, ['color_key', 'size_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_alter_product_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='color_key',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='size_key',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['product', 'color_key', 'size_key'], name='store_produ_product_abbb8d_idx'),
+        ),
+        migrations.RunPython(fill_variant_keys, migrations.RunPython.noop),
+    ]
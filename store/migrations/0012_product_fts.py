@@ -0,0 +1,55 @@
+import unicodedata
+
+from django.db import migrations, OperationalError
+
+
+FTS_TABLE = 'store_product_fts'
+
+
+def _normalize(value):
+    # Giống store.search.normalize_text: bỏ dấu tiếng Việt + chữ thường
+    value = (value or '').replace('đ', 'd').replace('Đ', 'D')
+    value = unicodedata.normalize('NFD', value)
+    return ''.join(ch for ch in value if not unicodedata.combining(ch)).lower()
+
+
+def create_product_fts(apps, schema_editor):
+    """Bảng ảo FTS5 cho tìm kiếm sản phẩm (store/search.py), nạp sẵn toàn bộ sản phẩm."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('store', 'Product')
+
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(product_name, description, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite không có FTS5 → store/search.py dùng backend 'python'
+            return
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, product_name, description) VALUES (%s, %s, %s)',
+            [
+                (pk, _normalize(name), _normalize(description))
+                for pk, name, description in Product.objects.values_list('id', 'product_name', 'description')
+            ],
+        )
+
+
+def drop_product_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_productvariant_color_key_productvariant_size_key_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_fts, drop_product_fts),
+    ]
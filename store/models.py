@@ -1,7 +1,29 @@
-from django.db import models
+from django.db import models, transaction
 from category.models import Category
 from django.urls import reverse
-from django.db.models import Sum   # 👈 THÊM IMPORT NÀY
+from django.db.models import Sum, Case, When, BooleanField   # 👈 THÊM IMPORT NÀY
+from django.db.models.functions import Coalesce
+
+
+# Còn từ 1 đến LOW_STOCK_THRESHOLD sản phẩm thì coi là sắp hết hàng
+LOW_STOCK_THRESHOLD = 10
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Thêm stock_total (tổng tồn kho các ProductVariant) và is_low_stock ngay trong câu query,
+        để trang danh sách không phải query lại tồn kho cho từng sản phẩm.
+        """
+        return self.annotate(
+            stock_total=Coalesce(Sum('variants__stock'), 0),
+        ).annotate(
+            is_low_stock=Case(
+                When(stock_total__gt=0, stock_total__lte=LOW_STOCK_THRESHOLD, then=True),
+                default=False,
+                output_field=BooleanField(),
+            ),
+        )
 
 
 class Product(models.Model):
@@ -10,12 +32,36 @@ class Product(models.Model):
     description = models.TextField(blank=True)
     price = models.IntegerField()
     images = models.ImageField(upload_to='photos/products')
-    stock = models.IntegerField()
+    # Tổng tồn kho các ProductVariant, do store/stock.py cập nhật – không sửa tay
+    stock = models.IntegerField(default=0)
     is_available = models.BooleanField(default=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     created_date = models.DateTimeField(auto_now_add=True)
     modified_date = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Trang cửa hàng: lọc is_available (+ category), sắp theo (created_date, id) – xem store/listing.py
+            models.Index(fields=['is_available', 'category', 'created_date', 'id']),
+            models.Index(fields=['is_available', 'created_date', 'id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Sản phẩm đã có: không ghi cột stock. stock chỉ đổi bằng delta F('stock') + n (store/stock.py),
+        # ghi lại giá trị đọc lúc mở form / admin sẽ xoá mất delta của biến thể / đơn hàng xảy ra ở giữa.
+        keep_stock = not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+        if keep_stock:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'stock' and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+        if keep_stock:
+            self.refresh_from_db(fields=['stock'])
+
     def get_url(self):
         return reverse('product_detail', args=[self.category.slug, self.slug])
 
@@ -23,9 +69,10 @@ class Product(models.Model):
         return self.product_name
 
     def total_stock(self):
-        from .models import ProductVariant
-        variants = ProductVariant.objects.filter(product=self)
-        return sum(v.stock for v in variants)
+        # Dùng stock_total nếu queryset đã with_stock(), nếu không thì query 1 lần rồi nhớ lại
+        if not hasattr(self, 'stock_total'):
+            self.stock_total = self.variants.aggregate(total=Sum('stock'))['total'] or 0
+        return self.stock_total
 
 
 class Variation(models.Model):
@@ -42,8 +89,13 @@ class Variation(models.Model):
         return self.variation_value
 
 
+def variant_key(value):
+    """Khoá so khớp màu / size: bỏ khoảng trắng thừa, chữ thường ('  Red ' -> 'red')."""
+    return ' '.join((value or '').split()).lower()
+
+
 class ProductVariant(models.Model):
-    """Tạm thời KHÔNG dùng. Có thể xoá trong tương lai nếu muốn clean DB."""
+    """SKU đang dùng: mỗi dòng là 1 combo màu + size, có tồn kho riêng."""
     product = models.ForeignKey(
         Product,
         on_delete=models.CASCADE,
@@ -53,17 +105,61 @@ class ProductVariant(models.Model):
     size = models.CharField(max_length=50, blank=True)
     stock = models.IntegerField(default=0)
 
+    # color / size đã chuẩn hoá (variant_key) để tìm biến thể bằng index thay vì __iexact
+    color_key = models.CharField(max_length=50, blank=True, editable=False)
+    size_key = models.CharField(max_length=50, blank=True, editable=False)
+
     class Meta:
         unique_together = ("product", "color", "size")
+        indexes = [
+            models.Index(fields=['product', 'color_key', 'size_key']),
+        ]
 
     def __str__(self):
         return f"{self.product.product_name} - {self.color} / {self.size}"
 
+    def _locked_saved_row(self):
+        """Dòng hiện tại trong DB (khoá lại tới hết transaction) để tính delta cho Product.stock."""
+        if self.pk is None:
+            return None
+        return ProductVariant.objects.select_for_update().filter(pk=self.pk).values('stock', 'product_id').first()
+
+    # 🔁 Mỗi lần lưu / xoá 1 biến thể → cộng / trừ phần chênh lệch vào Product.stock
+    def save(self, *args, **kwargs):
+        from .stock import apply_stock_delta
+
+        self.color_key = variant_key(self.color)
+        self.size_key = variant_key(self.size)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'color', 'size'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'color_key', 'size_key'}
+
+        with transaction.atomic():
+            saved = self._locked_saved_row()
+            super().save(*args, **kwargs)
+            if saved is None:
+                apply_stock_delta(self.product_id, self.stock)
+            elif saved['product_id'] != self.product_id:
+                apply_stock_delta(saved['product_id'], -saved['stock'])
+                apply_stock_delta(self.product_id, self.stock)
+            else:
+                apply_stock_delta(self.product_id, self.stock - saved['stock'])
+
+    def delete(self, *args, **kwargs):
+        from .stock import apply_stock_delta
+
+        with transaction.atomic():
+            saved = self._locked_saved_row()
+            result = super().delete(*args, **kwargs)
+            if saved is not None:
+                apply_stock_delta(saved['product_id'], -saved['stock'])
+        return result
+
 
 class VariationCombination(models.Model):
     """
-    SKU thật sự: mỗi dòng là 1 combo MÀU + SIZE của 1 sản phẩm,
-    có tồn kho riêng.
+    Mô hình combo cũ (dựa trên Variation), chỉ còn trong admin.
+    Tồn kho thật nằm ở ProductVariant; Product.stock không còn tính theo bảng này.
     """
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     color = models.ForeignKey(
@@ -80,22 +176,3 @@ class VariationCombination(models.Model):
 
     def __str__(self):
         return f"{self.product.product_name} - {self.color.variation_value} / {self.size.variation_value}"
-
-    # 🔁 Mỗi lần lưu / xoá 1 combo → cập nhật lại Product.stock = tổng stock các combo
-    def _recalculate_product_stock(self, product=None):
-        if product is None:
-            product = self.product
-        total = VariationCombination.objects.filter(product=product).aggregate(
-            total=Sum('stock')
-        )['total'] or 0
-        product.stock = total
-        product.save(update_fields=['stock'])
-
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self._recalculate_product_stock()
-
-    def delete(self, *args, **kwargs):
-        product = self.product
-        super().delete(*args, **kwargs)
-        self._recalculate_product_stock(product)
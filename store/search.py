@@ -0,0 +1,155 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Product
+
+
+# Tìm kiếm sản phẩm, chọn backend bằng settings.STORE_SEARCH_BACKEND:
+#   'fts5'   – bảng ảo SQLite FTS5, xếp hạng bằng bm25 (mặc định khi migration store 0012 đã tạo được bảng)
+#   'python' – duyệt toàn bộ sản phẩm trong Python (dự phòng cho DB không có FTS5)
+# Cả 2 đều so khớp không dấu: "ao so mi" tìm được "Áo sơ mi".
+SEARCH_PAGE_SIZE = 12
+FTS_TABLE = 'store_product_fts'
+
+# Tên sản phẩm quan trọng hơn mô tả khi xếp hạng
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize_text(value):
+    """Bỏ dấu tiếng Việt + chữ thường: 'Đầm Xoè' -> 'dam xoe'."""
+    value = (value or '').replace('đ', 'd').replace('Đ', 'D')
+    value = unicodedata.normalize('NFD', value)
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return value.lower()
+
+
+def tokenize(value):
+    return _TOKEN_RE.findall(normalize_text(value))
+
+
+class PythonSearchBackend:
+    """Dự phòng: đọc tên + mô tả của mọi sản phẩm, giữ sản phẩm chứa đủ các từ khoá."""
+
+    def search(self, keyword):
+        tokens = tokenize(keyword)
+        if not tokens:
+            return []
+
+        ranked = []
+        for pk, name, description in Product.objects.values_list('id', 'product_name', 'description'):
+            name = normalize_text(name)
+            text = name + ' ' + normalize_text(description)
+            if all(token in text for token in tokens):
+                score = sum(NAME_WEIGHT for token in tokens if token in name) + len(tokens) * DESCRIPTION_WEIGHT
+                ranked.append((-score, pk))
+        ranked.sort()
+        return [pk for _, pk in ranked]
+
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        return Product.objects.count()
+
+
+class FTS5Hits:
+    """
+    Kết quả FTS5 dạng lazy cho Paginator: count() và cắt lát [a:b] đều là 1 query,
+    chỉ đọc id của trang đang xem.
+    """
+
+    def __init__(self, match):
+        self.match = match
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self.match])
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        limit = (index.stop - start) if index.stop is not None else -1
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s OFFSET %s',
+                [self.match, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit, start],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class FTS5SearchBackend:
+    """
+    Bảng ảo FTS5 (rowid = Product.id) lưu tên + mô tả đã bỏ dấu.
+    Bảng được tạo và nạp dữ liệu bởi migration store 0012, sau đó đồng bộ qua signal của Product
+    (store/signals.py). Dựng lại toàn bộ: python manage.py rebuild_search_index
+    """
+
+    def search(self, keyword):
+        tokens = tokenize(keyword)
+        if not tokens:
+            return []
+        # Mỗi từ khoá là 1 prefix ("ao"* khớp "ao", "aothun"...), các từ nối bằng AND
+        return FTS5Hits(' '.join(f'"{token}"*' for token in tokens))
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, product_name, description) VALUES (%s, %s, %s)',
+                [product.pk, normalize_text(product.product_name), normalize_text(product.description)],
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+    def rebuild(self):
+        """Xoá và nạp lại toàn bộ chỉ mục, trả về số sản phẩm đã index."""
+        rows = [
+            (pk, normalize_text(name), normalize_text(description))
+            for pk, name, description in Product.objects.values_list('id', 'product_name', 'description').iterator()
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, product_name, description) VALUES (%s, %s, %s)', rows)
+        return len(rows)
+
+
+SEARCH_BACKENDS = {
+    'fts5': FTS5SearchBackend,
+    'python': PythonSearchBackend,
+}
+
+_backend = None
+
+
+def _fts5_available():
+    """Bảng FTS5 chỉ có khi DB là SQLite có FTS5 (migration store 0012 bỏ qua các trường hợp còn lại)."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+        if name is None:
+            name = 'fts5' if _fts5_available() else 'python'
+        _backend = SEARCH_BACKENDS[name]()
+    return _backend
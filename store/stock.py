@@ -0,0 +1,52 @@
+from django.db.models import F, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Product, ProductVariant
+
+
+# Product.stock là tổng tồn kho các ProductVariant của sản phẩm, được giữ đúng bằng các
+# delta F('stock') + n (không đọc-rồi-ghi) ở mọi chỗ làm thay đổi tồn kho biến thể:
+#   - ProductVariant.save() / delete()
+#   - chốt đơn (orders/checkout.py → apply_stock_deltas)
+# Các chỗ ghi thẳng bằng queryset.update() sẽ bỏ qua ledger → chạy lệnh reconcile_product_stock.
+
+
+def apply_stock_delta(product_id, delta):
+    if delta:
+        Product.objects.filter(pk=product_id).update(stock=F('stock') + delta)
+
+
+def apply_stock_deltas(deltas):
+    """
+    deltas: {product_id: delta}. Gom các sản phẩm có cùng delta vào 1 câu UPDATE
+    (giỏ hàng thường chỉ có vài số lượng khác nhau nên số query gần như không đổi).
+    """
+    by_delta = {}
+    for product_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(product_id)
+    for delta, product_ids in by_delta.items():
+        Product.objects.filter(pk__in=product_ids).update(stock=F('stock') + delta)
+
+
+def variant_stock_total():
+    """Subquery: tổng stock các biến thể của sản phẩm OuterRef('pk')."""
+    totals = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        total=Sum('stock')).values('total')
+    return Coalesce(Subquery(totals), 0)
+
+
+def find_stock_drift():
+    """Các sản phẩm có Product.stock khác tổng tồn kho biến thể: [(id, stock, stock_total)]."""
+    return list(
+        Product.objects.with_stock().exclude(stock=F('stock_total')).order_by('id').values_list(
+            'id', 'stock', 'stock_total')
+    )
+
+
+def reconcile_product_stock(product_ids=None):
+    """Ghi lại Product.stock = tổng stock biến thể bằng 1 câu UPDATE. Trả về số sản phẩm đã sửa."""
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return products.update(stock=variant_stock_total())
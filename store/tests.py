@@ -1,3 +1,53 @@
 from django.test import TestCase
 
-# Create your tests here.
+from category.models import Category
+from .forms import ProductForm
+from .models import Product, ProductVariant
+from .stock import apply_stock_deltas, find_stock_drift
+
+
+class ProductStockTests(TestCase):
+    """Product.stock chỉ đổi qua delta (store/stock.py): sửa sản phẩm không được ghi đè delta xảy ra ở giữa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(category_name='Áo', slug='ao')
+        cls.product = Product.objects.create(
+            product_name='Áo thun', slug='ao-thun', price=100, images='x.png', category=cls.category)
+        ProductVariant.objects.create(product=cls.product, color='Red', size='M', stock=5)
+
+    def test_form_edit_keeps_variant_delta_applied_in_between(self):
+        opened = Product.objects.get(pk=self.product.pk)  # staff mở form sửa: stock = 5
+        ProductVariant.objects.create(product=self.product, color='Blue', size='M', stock=3)
+
+        form = ProductForm({
+            'product_name': 'Áo thun cổ tròn', 'slug': 'ao-thun', 'description': '', 'price': 120,
+            'is_available': True, 'category': self.category.pk,
+        }, instance=opened)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.price, 120)
+        self.assertEqual(product.stock, 8)
+        self.assertEqual(opened.stock, 8)
+        self.assertEqual(find_stock_drift(), [])
+
+    def test_save_keeps_checkout_delta_applied_in_between(self):
+        opened = Product.objects.get(pk=self.product.pk)
+        apply_stock_deltas({self.product.pk: -2})
+        ProductVariant.objects.filter(product=self.product).update(stock=3)
+
+        opened.is_available = False
+        opened.save()
+
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 3)
+        self.assertEqual(find_stock_drift(), [])
+
+    def test_explicit_update_fields_are_respected(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=0)
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock = 5
+        product.save(update_fields=['stock'])
+
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 5)
@@ -37,6 +37,7 @@ urlpatterns = [
     path('', views.store, name='store'),
     path('search/', views.search, name='search'),
     path('category/<slug:category_slug>/', views.store, name='products_by_category'),
+    path('<int:product_id>/variants.json', views.product_variants_json, name='product_variants_json'),
 
     # CUỐI CÙNG — PRODUCT DETAIL
     path('<slug:category_slug>/<slug:product_slug>/', views.product_detail, name='product_detail'),
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ProductVariant, variant_key
+
+
+# Ma trận biến thể của 1 sản phẩm: màu × size → tồn kho.
+# Dựng bằng 1 query, cache theo sản phẩm trong cache dùng chung (settings.CACHES) → xoá cache khi
+# ProductVariant thay đổi (store/signals.py) hoặc khi chốt đơn trừ tồn kho (orders/checkout.py)
+# có hiệu lực với mọi worker. Tồn kho bị sửa bằng queryset.update() không qua 2 chỗ đó thì
+# ma trận cũ tự hết hạn sau VARIANT_MATRIX_TIMEOUT.
+VARIANT_MATRIX_TIMEOUT = 60 * 10
+
+
+def _matrix_key(product_id):
+    return f'store:variants:{product_id}'
+
+
+def build_variant_matrix(product_id):
+    """
+    {
+        'colors': ['Red', 'Blue'],            # theo thứ tự tạo biến thể
+        'sizes': ['M', 'L'],
+        'stock': {'Red': {'M': 3, 'L': 0}, ...},
+        'total': 3,
+    }
+    """
+    colors = []
+    sizes = []
+    stock = {}
+    rows = ProductVariant.objects.filter(product_id=product_id).order_by('id').values_list('color', 'size', 'stock')
+    for color, size, qty in rows:
+        if color not in stock:
+            colors.append(color)
+            stock[color] = {}
+        if size not in sizes:
+            sizes.append(size)
+        stock[color][size] = qty
+
+    return {
+        'colors': colors,
+        'sizes': sizes,
+        'stock': stock,
+        'total': sum(qty for by_size in stock.values() for qty in by_size.values()),
+    }
+
+
+def get_variant_matrix(product_id):
+    key = _matrix_key(product_id)
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = build_variant_matrix(product_id)
+        cache.set(key, matrix, VARIANT_MATRIX_TIMEOUT)
+    return matrix
+
+
+def invalidate_variant_matrix(product_ids):
+    keys = [_matrix_key(product_id) for product_id in product_ids]
+    cache.delete_many(keys)
+    # Xoá thêm 1 lần sau commit để request khác không kịp cache lại dữ liệu cũ trong lúc transaction chưa xong
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def resolve_variant(product_id, color, size):
+    """
+    Tìm biến thể theo màu & size (không phân biệt hoa thường / khoảng trắng) bằng index
+    (product, color_key, size_key), lấy kèm product trong cùng 1 query. Không có → None.
+    """
+    return ProductVariant.objects.select_related('product').filter(
+        product_id=product_id,
+        color_key=variant_key(color),
+        size_key=variant_key(size),
+    ).first()
@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
 from django.core.paginator import Paginator
 
 from carts.views import _cart_id
@@ -9,6 +9,9 @@ from carts.models import CartItem
 
 from .models import Product, Variation, ProductVariant
 from .forms import ProductForm, VariationForm, ProductVariantForm
+from .listing import get_listing_queryset, get_listing_page, get_product_count
+from .search import get_search_backend, SEARCH_PAGE_SIZE
+from .variants import get_variant_matrix
 
 from category.models import Category
 from .models import Category
@@ -22,73 +25,83 @@ def staff_category_list(request):
 # STORE – TRANG KHÁCH HÀNG
 # ===============================
 def store(request, category_slug=None):
+    category = None
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
-        products = Product.objects.filter(category=category, is_available=True)
-    else:
-        products = Product.objects.filter(is_available=True).order_by("id")
 
-    paginator = Paginator(products, 10)
-    page = request.GET.get("page")
-    page_products = paginator.get_page(page)
+    products = get_listing_queryset(category)
+    page_products = get_listing_page(products, request.GET.get("cursor"))
 
     return render(request, "store/store.html", {
         "products": page_products,
-        "product_count": products.count(),
+        "product_count": get_product_count(category),
+        "is_search": False,
     })
 
 
 def product_detail(request, category_slug, product_slug):
     product = get_object_or_404(Product, category__slug=category_slug, slug=product_slug)
 
-    # Lấy combo (ProductVariant)
-    variants = ProductVariant.objects.filter(product=product)
-
-    # Lấy list màu và size từ combo
-    colors = variants.values_list("color", flat=True).distinct()
-    sizes  = variants.values_list("size",  flat=True).distinct()
-
-    # Tổng stock
-    total_stock = sum(v.stock for v in variants)
+    # Màu, size và tồn kho từng combo (ProductVariant) – 1 query, có cache
+    matrix = get_variant_matrix(product.id)
 
     return render(request, "store/product_detail.html", {
         "single_product": product,
-        "colors": colors,
-        "sizes": sizes,
-        "total_stock": total_stock,
+        "colors": matrix["colors"],
+        "sizes": matrix["sizes"],
+        "variant_matrix": matrix,
+        # Tổng stock (Product.stock luôn bằng tổng tồn kho các combo – store/stock.py)
+        "total_stock": product.stock,
     })
 
 
+def product_variants_json(request, product_id):
+    """Ma trận màu × size → tồn kho cho JS (disable combo hết hàng)."""
+    get_object_or_404(Product, id=product_id, is_available=True)
+    return JsonResponse(get_variant_matrix(product_id))
+
+
 def search(request):
-    keyword = request.GET.get("keyword", "")
+    keyword = request.GET.get("keyword", "").strip()
     if keyword:
-        products = Product.objects.filter(
-            Q(description__icontains=keyword) | Q(product_name__icontains=keyword)
-        )
+        hits = get_search_backend().search(keyword)
     else:
-        products = Product.objects.all()
+        hits = Product.objects.order_by("-created_date", "-id").values_list("id", flat=True)
+
+    page = Paginator(hits, SEARCH_PAGE_SIZE).get_page(request.GET.get("page"))
+
+    # Chỉ nạp sản phẩm của trang đang xem, giữ đúng thứ tự xếp hạng
+    products = Product.objects.select_related("category").in_bulk(list(page.object_list))
+    page.object_list = [products[pk] for pk in page.object_list if pk in products]
 
     return render(request, "store/store.html", {
-        "products": products,
-        "product_count": len(products),
+        "products": page,
+        "product_count": page.paginator.count,
+        "keyword": keyword,
+        "is_search": True,
     })
 
 
 # ===============================
 # STAFF – QUẢN LÝ SẢN PHẨM
 # ===============================
+STAFF_PRODUCTS_PER_PAGE = 20
+
 @login_required(login_url="login")
 def staff_product_list(request):
     categories = Category.objects.all().order_by('category_name')
     category_filter = request.GET.get('category', 'all')
 
-    if category_filter == "all":
-        products = Product.objects.all().order_by('-id')
-    else:
-        products = Product.objects.filter(category__id=category_filter).order_by('-id')
+    products = Product.objects.with_stock().select_related('category').order_by('-id')
+    if category_filter != "all":
+        products = products.filter(category__id=category_filter)
+
+    paginator = Paginator(products, STAFF_PRODUCTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
 
     return render(request, 'store/staff_product_list.html', {
-        'products': products,
+        'products': page_obj,
+        'page_obj': page_obj,
         'categories': categories,
         'category_filter': category_filter,
     })